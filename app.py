@@ -1,14 +1,23 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import networkx as nx
-from pyvis.network import Network
 import json
-import tempfile
 import os
+import ijson
+import orjson
 from collections import defaultdict, Counter
-from typing import Dict, List, Tuple, Any
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple, Any
+
+try:
+    from scipy import sparse
+except ImportError:  # dense NumPy fallback in build_coauthor_edges
+    sparse = None
+
+# pyvis and networkx are imported where used to keep cold start light
 
 # Import the new literature harvester library
 from literature_harvester import LiteratureHarvester, Config
@@ -22,108 +31,222 @@ st.set_page_config(
 )
 
 @st.cache_data
-def load_payload(file_path: str) -> Dict[str, Any]:
-    """Load and cache JSON payload"""
+def _load_payload_cached(file_path: str, size: int, mtime_ns: int) -> Dict[str, Any]:
+    """Load and cache payload metadata; parsing stops once the PubMed header is read"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(file_path, 'rb') as f:
+            return {'pubmed': next(ijson.items(f, 'pubmed', use_float=True), {})}
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return {}
 
-def flatten_items(payload: Dict[str, Any]) -> pd.DataFrame:
+def load_payload(file_path: str) -> Dict[str, Any]:
+    """Load payload metadata, keyed on size and mtime so an overwritten file is re-read"""
+    s = os.stat(file_path)
+    return _load_payload_cached(file_path, s.st_size, s.st_mtime_ns)
+
+def load_items(file_path: str) -> List[Dict[str, Any]]:
+    """Parse payload items with orjson; the raw bytes are released once parsed"""
+    return orjson.loads(Path(file_path).read_bytes()).get('items', [])
+
+# Top-level scalar columns and the value used when an item lacks the key
+SCALAR_DEFAULTS = (('pmid', ''), ('title', ''), ('journal', ''), ('pub_year', 0), ('doi', ''))
+
+def flatten_items(items: Iterable[Dict[str, Any]]) -> pd.DataFrame:
     """Convert payload items to DataFrame"""
-    items = payload.get('items', [])
+    items = list(items)
     if not items:
         return pd.DataFrame()
+
+    # Top-level scalars straight from the item dicts
+    pmids, titles, journals, pub_years, dois = (
+        [item.get(key, default) for item in items] for key, default in SCALAR_DEFAULTS
+    )
+
+    # Normalize nested citation/OpenAlex fields into flat columns in one pass
+    base = pd.json_normalize(items, max_level=3)
+
+    def column(name: str, default: Any = None) -> pd.Series:
+        if name in base.columns:
+            return base[name]
+        return pd.Series(default, index=base.index, dtype=object)
+
+    # Citation values - missing citations/sources come through as NaN
+    oa_citations = column('citations.sources.openalex.value')
+    ic_citations = column('citations.sources.icite.value')
+    has_openalex = oa_citations.notna()
+    has_icite = ic_citations.notna()
+
+    # Concepts: first three joined
+    concepts = column('openalex.concepts')
+    concept_str = concepts.where(concepts.notna(), '').str.slice(0, 3).str.join(', ').fillna('')
+
+    # Authors: names list plus "A, B, C (+N more)" summary
+    author_names = [tuple(auth.get('name', '') for auth in (item.get('authors') or [])) for item in items]
+    author_list = pd.Series(author_names, index=base.index, dtype=object)
+    n_authors = author_list.str.len().to_numpy()
+    more = pd.Series(np.where(n_authors > 3, [f' (+{n - 3} more)' for n in n_authors], ''), index=base.index)
+    author_str = author_list.str.slice(0, 3).str.join(', ') + more
+
+    # Institutions: unique names in order of first appearance
+    institutions = [
+        tuple(dict.fromkeys(name for name in (inst.get('name', '') for inst in chain.from_iterable(
+            author.get('institutions', ()) for author in item.get('authors') or ())) if name))
+        for item in items
+    ]
+
+    df = pd.DataFrame({
+        'pmid': pmids,
+        'title': titles,
+        'journal': journals,
+        'pub_year': pub_years,
+        'doi': dois,
+        'citations_value': column('citations.value').fillna(0),
+        'citations_source': column('citations.source_of_truth').fillna(''),
+        'discrepancy': column('citations.discrepancy').fillna(0),
+        'openalex_citations': oa_citations.fillna(0),
+        'icite_citations': ic_citations.fillna(0),
+        'concepts': concept_str,
+        'authors': author_str,
+        'author_list': author_list,
+        'institutions': pd.Series(institutions, index=base.index, dtype=object),
+        'has_openalex': has_openalex,
+        'has_icite': has_icite,
+        'has_both': has_openalex & has_icite
+    })
+
+    # Shrink repetitive strings to category codes and counts to the narrowest int
+    for col in ('journal', 'citations_source'):
+        df[col] = df[col].astype('category')
+    for col in ('pub_year', 'citations_value', 'openalex_citations', 'icite_citations', 'discrepancy'):
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    return df
+
+@st.cache_data
+def _load_df_cached(file_path: str, size: int, mtime_ns: int) -> pd.DataFrame:
+    """Load and cache the flattened DataFrame; size and mtime_ns key the cache to the file version"""
+    # A Parquet sidecar at least as new as the JSON skips parsing and flattening
+    parquet_path = file_path + '.parquet'
+    if os.path.exists(parquet_path) and os.stat(parquet_path).st_mtime_ns >= mtime_ns:
+        try:
+            df = pd.read_parquet(parquet_path)
+            for col in ('author_list', 'institutions'):
+                df[col] = df[col].map(tuple)
+            return df
+        except Exception:
+            pass  # Unreadable sidecar - rebuild it from the JSON below
     
-    rows = []
-    for item in items:
-        citations = item.get('citations')
-        openalex = item.get('openalex', {})
-        icite = item.get('icite', {})
-        
-        # Get citation values - handle null cases safely
-        sources = citations.get('sources', {}) if citations is not None else {}
-        oa_citations = sources.get('openalex', {}).get('value') if sources.get('openalex') else None
-        ic_citations = sources.get('icite', {}).get('value') if sources.get('icite') else None
-        
-        # Extract concepts
-        concepts = openalex.get('concepts', [])
-        concept_str = ', '.join(concepts[:3]) if concepts else ''
-        
-        # Extract authors
-        authors = item.get('authors', [])
-        author_names = [auth.get('name', '') for auth in authors]
-        author_str = ', '.join(author_names[:3])
-        if len(author_names) > 3:
-            author_str += f' (+{len(author_names)-3} more)'
-        
-        # Extract institutions
-        institutions = []
-        for author in authors:
-            for inst in author.get('institutions', []):
-                inst_name = inst.get('name', '')
-                if inst_name and inst_name not in institutions:
-                    institutions.append(inst_name)
-        
-        row = {
-            'pmid': item.get('pmid', ''),
-            'title': item.get('title', ''),
-            'journal': item.get('journal', ''),
-            'pub_year': item.get('pub_year', 0),
-            'doi': item.get('doi', ''),
-            'citations_value': citations.get('value', 0) if citations is not None else 0,
-            'citations_source': citations.get('source_of_truth', '') if citations is not None else '',
-            'discrepancy': citations.get('discrepancy', 0) if citations is not None else 0,
-            'openalex_citations': oa_citations if oa_citations is not None else 0,
-            'icite_citations': ic_citations if ic_citations is not None else 0,
-            'concepts': concept_str,
-            'authors': author_str,
-            'author_list': author_names,
-            'institutions': institutions,
-            'has_openalex': oa_citations is not None,
-            'has_icite': ic_citations is not None,
-            'has_both': oa_citations is not None and ic_citations is not None
-        }
-        rows.append(row)
-    
-    return pd.DataFrame(rows)
+    try:
+        df = flatten_items(load_items(file_path))
+    except Exception as e:
+        st.error(f"Error loading file: {e}")
+        return pd.DataFrame()
+    if not df.empty:
+        # Lowercased title+journal so text search is a single literal scan
+        df['_search_blob'] = (df['title'].fillna('') + '\x1f' +
+                              df['journal'].astype(object).fillna('')).str.lower()
+        try:
+            df.to_parquet(parquet_path, compression='zstd', index=False)
+        except Exception:
+            pass  # The sidecar is only a load-time shortcut; read-only dirs just skip it
+    return df
 
-def build_coauthor_edges(df: pd.DataFrame, max_nodes: int = 150) -> Tuple[List[Tuple], Dict[str, int]]:
+def load_df(file_path: str) -> pd.DataFrame:
+    """Load the flattened DataFrame for the current version of file_path"""
+    s = os.stat(file_path)
+    return _load_df_cached(file_path, s.st_size, s.st_mtime_ns)
+
+@st.cache_data
+def compute_author_counts(author_lists: Tuple[Tuple[str, ...], ...]) -> Counter:
+    """Count papers per author in a single pass, stripping names the same way top_counts does"""
+    return Counter(name for lst in author_lists for name in (a.strip() for a in lst if a) if name)
+
+def top_counts(name_lists: pd.Series, n: int = 10) -> pd.Series:
+    """Most frequent non-blank names across a column of name lists"""
+    return name_lists.explode().str.strip().replace('', np.nan).dropna().value_counts().head(n)
+
+def build_coauthor_edges(author_lists: Sequence[Sequence[str]], max_nodes: int = 150,
+                         author_counts: Counter = None) -> Tuple[List[Tuple], Dict[str, int]]:
     """Build coauthor network edges"""
-    if df.empty:
+    if len(author_lists) == 0:
         return [], {}
     
     # Count author frequencies
-    author_counts = Counter()
-    for authors in df['author_list']:
-        for author in authors:
-            if author.strip():
-                author_counts[author] += 1
+    if author_counts is None:
+        author_counts = compute_author_counts(tuple(author_lists))
     
     # Get top authors
     top_authors = [author for author, _ in author_counts.most_common(max_nodes)]
-    top_author_set = set(top_authors)
-    
-    # Build edges
-    edges = []
-    for authors in df['author_list']:
-        paper_authors = [a for a in authors if a in top_author_set]
-        for i, auth1 in enumerate(paper_authors):
-            for auth2 in paper_authors[i+1:]:
-                edges.append((auth1, auth2))
-    
-    # Count edge weights
-    edge_counts = Counter(edges)
-    weighted_edges = [(a1, a2, count) for (a1, a2), count in edge_counts.items()]
-    
+    author_to_id = {author: i for i, author in enumerate(top_authors)}
+
+    # Authorship incidence matrix A (papers x top authors)
+    rows, cols = [], []
+    for paper_idx, authors in enumerate(author_lists):
+        for author in authors:
+            author_id = author_to_id.get(author.strip()) if author else None
+            if author_id is not None:
+                rows.append(paper_idx)
+                cols.append(author_id)
+
+    if not rows:
+        return [], author_counts
+
+    # Edge weights are the off-diagonal coauthorship counts of A^T A
+    if sparse is not None:
+        A = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                              shape=(len(author_lists), len(top_authors)))
+        A.data[:] = 1  # an author listed twice on a paper still counts once
+        U = (A.T @ A).tocoo()
+        mask = U.row < U.col
+        row_ids, col_ids, weights = U.row[mask], U.col[mask], U.data[mask]
+    else:
+        # max_nodes bounds the author axis, so a dense matrix stays small
+        A = np.zeros((len(author_lists), len(top_authors)), dtype=np.int32)
+        A[rows, cols] = 1
+        U = np.triu(A.T @ A, k=1)
+        row_ids, col_ids = np.nonzero(U)
+        weights = U[row_ids, col_ids]
+
+    names = np.array(top_authors, dtype=object)
+    weighted_edges = list(zip(names[row_ids], names[col_ids], weights.tolist()))
+
     return weighted_edges, author_counts
 
-def render_pyvis_network(edges: List[Tuple], name_map: Dict[str, int]) -> str:
+@st.cache_data(max_entries=8)
+def cached_coauthor_edges(pmids: Tuple[str, ...], author_lists: Tuple[Tuple[str, ...], ...],
+                          max_nodes: int) -> Tuple[List[Tuple], Dict[str, int]]:
+    """Memoize coauthor edges per paper set; pmids only serve as part of the cache key"""
+    return build_coauthor_edges(author_lists, max_nodes=max_nodes)
+
+# Settle the layout during a bounded stabilization run before first paint
+STATIC_LAYOUT_OPTIONS = json.dumps({
+    "physics": {
+        "solver": "forceAtlas2Based",
+        "forceAtlas2Based": {"gravitationalConstant": -50, "springLength": 100, "springConstant": 0.08},
+        "stabilization": {"enabled": True, "iterations": 150, "fit": True},
+        "minVelocity": 0.75
+    },
+    "interaction": {"hideEdgesOnDrag": True}
+})
+
+# vis.js keeps simulating after stabilization; freeze the settled layout instead
+NETWORK_CONSTRUCTOR = "network = new vis.Network(container, data, options);"
+FREEZE_AFTER_STABILIZATION = (
+    NETWORK_CONSTRUCTOR
+    + "\n                  network.once('stabilizationIterationsDone', function () {"
+    + " network.setOptions({physics: {enabled: false}}); });"
+)
+
+def render_pyvis_network(edges: List[Tuple], name_map: Dict[str, int], live_physics: bool = False) -> str:
     """Render PyVis network and return HTML content."""
+    from pyvis.network import Network
+
     net = Network(height="500px", width="100%", bgcolor="#222222", font_color="white")
-    net.barnes_hut()
+    if live_physics:
+        net.barnes_hut()
+    else:
+        net.set_options(STATIC_LAYOUT_OPTIONS)
     
     # Add nodes
     for author, count in name_map.items():
@@ -136,34 +259,45 @@ def render_pyvis_network(edges: List[Tuple], name_map: Dict[str, int]) -> str:
         if auth1 in name_map and auth2 in name_map:
             net.add_edge(auth1, auth2, width=min(weight, 10), title=f"Collaborations: {weight}")
     
-    # Generate HTML with better file handling for Windows
-    temp_file = None
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as f:
-            temp_file = f.name
-            net.save_graph(temp_file)
-        
-        # Read the file content
-        with open(temp_file, 'r', encoding='utf-8') as html_file:
-            html_content = html_file.read()
-        
-        return html_content
+        html = net.generate_html(notebook=False)
+        if not live_physics:
+            html = html.replace(NETWORK_CONSTRUCTOR, FREEZE_AFTER_STABILIZATION, 1)
+        return html
     except Exception as e:
         st.error(f"Error generating network visualization: {str(e)}")
         return "<div>Error generating network visualization</div>"
-    finally:
-        # Clean up temporary file with retry mechanism for Windows
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.unlink(temp_file)
-            except PermissionError:
-                # On Windows, sometimes the file is still locked, try again after a short delay
-                import time
-                time.sleep(0.1)
-                try:
-                    os.unlink(temp_file)
-                except:
-                    pass  # If we still can't delete it, let the OS clean it up later
+
+def render_plotly_network(edges: List[Tuple], name_map: Dict[str, int]) -> go.Figure:
+    """Lay out the network server-side and draw it with WebGL traces (no browser physics)."""
+    import networkx as nx
+
+    G = nx.Graph()
+    G.add_weighted_edges_from(edges)
+    pos = nx.spring_layout(G, seed=0, iterations=50)
+    
+    # Edges as one polyline trace with None separators
+    edge_x, edge_y = [], []
+    for auth1, auth2 in G.edges():
+        (x0, y0), (x1, y1) = pos[auth1], pos[auth2]
+        edge_x += [x0, x1, None]
+        edge_y += [y0, y1, None]
+    
+    nodes = list(G.nodes())
+    node_xy = np.array([pos[author] for author in nodes])
+    counts = [name_map.get(author, 0) for author in nodes]
+    
+    fig = go.Figure([
+        go.Scattergl(x=edge_x, y=edge_y, mode='lines', line=dict(width=0.5, color='#888888'),
+                     hoverinfo='skip'),
+        go.Scattergl(x=node_xy[:, 0], y=node_xy[:, 1], mode='markers',
+                     marker=dict(size=[min(6 + count * 2, 30) for count in counts], color='#2E86AB'),
+                     text=[f"{author}<br>Papers: {count}" for author, count in zip(nodes, counts)],
+                     hoverinfo='text')
+    ])
+    fig.update_layout(showlegend=False, height=500, margin=dict(l=0, r=0, t=0, b=0),
+                      xaxis=dict(visible=False), yaxis=dict(visible=False))
+    return fig
 
 def main():
     # Header with improved styling
@@ -203,8 +337,8 @@ def main():
             if search_query.strip():
                 with st.spinner("Running literature search..."):
                     try:
-                        # Initialize the harvester with configuration
-                        config = Config()
+                        # Initialize the harvester with the shared configuration
+                        config = Config.instance()
                         harvester = LiteratureHarvester(config)
                         
                         # Show search parameters
@@ -265,7 +399,7 @@ def main():
         st.error("Failed to load data")
         return
     
-    df = flatten_items(payload)
+    df = load_df(file_path)
     if df.empty:
         st.warning("No data found in the file")
         return
@@ -290,9 +424,7 @@ def main():
     # Text search
     search_text = st.sidebar.text_input("Search (Title/Journal)")
     if search_text:
-        mask = (df_filtered['title'].str.contains(search_text, case=False, na=False) |
-                df_filtered['journal'].str.contains(search_text, case=False, na=False))
-        df_filtered = df_filtered[mask]
+        df_filtered = df_filtered[df_filtered['_search_blob'].str.contains(search_text.lower(), regex=False, na=False)]
     
     # KPIs
     st.markdown("## 📊 Research Analytics Overview")
@@ -302,12 +434,15 @@ def main():
     fetched_count = pubmed_data.get('fetched_count', 0)
     coverage = (fetched_count / total_count * 100) if total_count > 0 else 0
     
-    both_sources = df_filtered['has_both'].sum()
+    both = df_filtered['has_both'].to_numpy()
+    both_sources = int(both.sum())
     high_discrepancy = 0
     if both_sources > 0:
-        high_disc_mask = (df_filtered['has_both'] & 
-                         (df_filtered['discrepancy'] / df_filtered[['openalex_citations', 'icite_citations']].max(axis=1) > 0.1))
-        high_discrepancy = high_disc_mask.sum()
+        denom = np.maximum(df_filtered['openalex_citations'].to_numpy(), df_filtered['icite_citations'].to_numpy())
+        disc = df_filtered['discrepancy'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(denom > 0, disc / denom, 0.0)
+        high_discrepancy = int((both & (ratio > 0.1)).sum())
     
     high_disc_pct = (high_discrepancy / both_sources * 100) if both_sources > 0 else 0
     
@@ -332,7 +467,7 @@ def main():
         # Yearly publications
         st.markdown("### 📅 Publications by Year")
         if 'pub_year' in df_filtered.columns:
-            year_counts = df_filtered['pub_year'].value_counts().sort_index()
+            year_counts = df_filtered.groupby('pub_year', sort=True, observed=True).size()
             fig1 = px.bar(x=year_counts.index, y=year_counts.values, 
                          labels={'x': 'Year', 'y': 'Count'})
             fig1.update_layout(showlegend=False)
@@ -341,12 +476,20 @@ def main():
     with col2:
         # Citation scatter
         st.markdown("### 🔗 OpenAlex vs iCite Citations")
-        scatter_df = df_filtered[df_filtered['has_both']].copy()
+        scatter_df = df_filtered.loc[df_filtered['has_both'], ['openalex_citations', 'icite_citations', 'title']]
         if not scatter_df.empty:
-            fig2 = px.scatter(scatter_df, x='openalex_citations', y='icite_citations',
-                             hover_data=['title'], opacity=0.7)
+            # One WebGL marker per distinct (x, y) pair, sized by how many papers share it
+            agg = (scatter_df.groupby(['openalex_citations', 'icite_citations'])
+                   .agg(n=('title', 'size'), sample_title=('title', 'first'))
+                   .reset_index())
+            fig2 = go.Figure(go.Scattergl(
+                x=agg['openalex_citations'], y=agg['icite_citations'], mode='markers',
+                marker=dict(size=3 + np.log1p(agg['n']) * 3, opacity=0.7),
+                text=agg['sample_title'].fillna('') + ' (×' + agg['n'].astype(str) + ')',
+                hoverinfo='x+y+text', name='Articles'))
+            fig2.update_layout(xaxis_title='openalex_citations', yaxis_title='icite_citations')
             # Add diagonal line
-            max_val = max(scatter_df['openalex_citations'].max(), scatter_df['icite_citations'].max())
+            max_val = max(agg['openalex_citations'].max(), agg['icite_citations'].max())
             fig2.add_trace(go.Scatter(x=[0, max_val], y=[0, max_val], 
                                     mode='lines', name='y=x', line=dict(dash='dash')))
             st.plotly_chart(fig2, width='stretch')
@@ -368,32 +511,20 @@ def main():
     with col4:
         # Top authors
         st.markdown("### 👨‍🔬 Top Authors by Papers")
-        author_counts = Counter()
-        for authors in df_filtered['author_list']:
-            for author in authors:
-                if author.strip():
-                    author_counts[author] += 1
+        top_10 = top_counts(df_filtered['author_list'], 10)
         
-        if author_counts:
-            top_10 = author_counts.most_common(10)
-            fig4 = px.bar(x=[count for _, count in top_10], 
-                         y=[name for name, _ in top_10],
+        if not top_10.empty:
+            fig4 = px.bar(x=top_10.values, y=top_10.index,
                          orientation='h', labels={'x': 'Papers', 'y': 'Author'})
             fig4.update_layout(yaxis={'categoryorder': 'total ascending'})
             st.plotly_chart(fig4, width='stretch')
     
     # Top institutions
     st.markdown("### 🏛️ Top Institutions by Papers")
-    inst_counts = Counter()
-    for institutions in df_filtered['institutions']:
-        for inst in institutions:
-            if inst.strip():
-                inst_counts[inst] += 1
-    
-    if inst_counts:
-        top_10_inst = inst_counts.most_common(10)
-        fig5 = px.bar(x=[name for name, _ in top_10_inst], 
-                     y=[count for _, count in top_10_inst],
+    top_10_inst = top_counts(df_filtered['institutions'], 10)
+    
+    if not top_10_inst.empty:
+        fig5 = px.bar(x=top_10_inst.index, y=top_10_inst.values,
                      labels={'x': 'Institution', 'y': 'Papers'})
         fig5.update_xaxes(tickangle=45)
         st.plotly_chart(fig5, width='stretch')
@@ -401,20 +532,19 @@ def main():
     # Data table
     st.markdown("## 📋 Research Articles Database")
     
-    # Prepare display dataframe
-    display_df = df_filtered.copy()
-    if 'doi' in display_df.columns:
-        display_df['doi_link'] = display_df['doi'].apply(
-            lambda x: f"https://doi.org/{x}" if x else ""
-        )
-    
     # Select columns for display
     display_cols = ['pub_year', 'pmid', 'title', 'journal', 'doi', 
                    'citations_value', 'discrepancy', 'concepts']
-    available_cols = [col for col in display_cols if col in display_df.columns]
+    available_cols = [col for col in display_cols if col in df_filtered.columns]
+    display_df = df_filtered.loc[:, available_cols]
+    
+    # PubMed DOIs are bare while OpenAlex ones are already URLs
+    if 'doi' in display_df.columns:
+        doi = display_df['doi'].fillna('')
+        display_df = display_df.assign(doi=doi.where(doi.str.startswith('http') | (doi == ''), 'https://doi.org/' + doi))
     
     st.dataframe(
-        display_df[available_cols],
+        display_df,
         width='stretch',
         column_config={
             "doi": st.column_config.LinkColumn("DOI", display_text="Link"),
@@ -426,13 +556,22 @@ def main():
     # Coauthor network
     st.markdown("## 🕸️ Research Collaboration Network")
     
+    network_mode = st.radio("Renderer", ["Interactive (PyVis)", "Fast (Plotly WebGL)"], horizontal=True)
+    live_physics = st.checkbox("Enable live physics", value=False,
+                               disabled=network_mode != "Interactive (PyVis)",
+                               help="Keep the force simulation running in the browser (slower for large networks)")
+    
     if st.button("🔄 Generate Network Visualization"):
         with st.spinner("Building coauthor network..."):
-            edges, name_map = build_coauthor_edges(df_filtered, max_nodes=150)
+            edges, name_map = cached_coauthor_edges(tuple(df_filtered['pmid']),
+                                                    tuple(df_filtered['author_list']), 150)
             
             if edges:
-                html_content = render_pyvis_network(edges, name_map)
-                st.components.v1.html(html_content, height=500)
+                if network_mode == "Fast (Plotly WebGL)":
+                    st.plotly_chart(render_plotly_network(edges, name_map), width='stretch')
+                else:
+                    html_content = render_pyvis_network(edges, name_map, live_physics=live_physics)
+                    st.components.v1.html(html_content, height=500)
                 st.info(f"Network shows {len(name_map)} authors with {len(edges)} collaborations")
             else:
                 st.warning("No coauthor relationships found in the data")
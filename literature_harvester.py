@@ -5,24 +5,36 @@ Queries PubMed, OpenAlex, and iCite APIs to collect comprehensive article data
 """
 
 import argparse
-import json
+import io
+import logging
 import math
 import os
 import random
 import re
+import socket
+import threading
 import time
-import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
-from urllib.parse import urlencode
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union, Any
+from urllib.parse import urlencode, urlsplit
 
+import numpy as np
+import orjson
 import requests
+import requests_cache
+from lxml import etree
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger('literature_harvester')
+
 # API Endpoints
 PUBMED_BASE = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
 OPENALEX_BASE = "https://api.openalex.org"
@@ -35,39 +47,236 @@ OPENALEX_RATE = 10  # requests per second
 ICITE_RATE = 10  # requests per second
 
 # Batch sizes
-PUBMED_BATCH_SIZE = 200
 OPENALEX_BATCH_SIZE = 200
 ICITE_BATCH_SIZE = 500
 
+USER_AGENT = "literature-harvester/1.0"
+
+# On-disk response cache: per-endpoint lifetimes in seconds. ESearch is kept short because
+# its WebEnv expires on NCBI's side; records and citation counts change slowly or not at all
+DEFAULT_CACHE_FILE = ".lit_cache.sqlite"
+CACHE_EXPIRE_AFTER = {
+    '*/esearch.fcgi': 3600,
+    '*/esummary.fcgi': 7 * 86400,
+    '*/efetch.fcgi': 30 * 86400,
+    '*/works': 86400,
+    '*/api/pubs': 86400,
+}
+
+# Seconds a resolved API host address is reused before asking the resolver again
+DNS_CACHE_TTL = 300
+
+# Worker threads for concurrent requests; the per-host rate limit still applies
+MAX_WORKERS = 8
+
+# EFetch pages whose citation lookups may be in flight at once
+PIPELINE_DEPTH = 4
+
+
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+_TRAILING_DIGITS_RE = re.compile(r'(\d+)$')
+
+# Compiled once; ELocationID precedes ArticleIdList in document order, so the union keeps
+# the ELocationID-first preference
+_PMID_XPATH = etree.XPath('string(.//PMID)')
+_DOI_XPATH = etree.XPath('string((.//ELocationID[@EIdType="doi"] | .//ArticleId[@IdType="doi"])[1])')
+_TITLE_XPATH = etree.XPath('string(.//ArticleTitle)')
+_JOURNAL_XPATH = etree.XPath('string(.//Journal/Title)')
+_PUBDATE_XPATH = etree.XPath('string(.//PubDate/Year | .//PubDate/MedlineDate)')
+_AUTHOR_XPATH = etree.XPath('.//AuthorList/Author')
+
+
+def _make_session(base_url: str, cache: Optional[requests_cache.BaseCache] = None) -> requests.Session:
+    """Create a keep-alive session with a connection pool for one API host"""
+    if cache is None:
+        session = requests.Session()
+    else:
+        # POST is cached too (EFetch pages); the body is part of the cache key
+        session = requests_cache.CachedSession(
+            backend=cache, urls_expire_after=CACHE_EXPIRE_AFTER, expire_after=86400,
+            allowable_methods=('GET', 'POST'), ignored_parameters=['api_key', 'email'],
+            stale_if_error=True)
+    # Retries are handled by retry_request, so the adapter never retries on its own
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=64, max_retries=0))
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
+
+
+# One pooled session per host, shared by every call so sockets are reused across batches.
+# OpenAlex also speaks HTTP/2, but its batches are already spread over MAX_WORKERS warm
+# keep-alive connections, and staying on requests keeps the response cache and retry handling
+_PUBMED_SESSION = _make_session(PUBMED_BASE)
+_OPENALEX_SESSION = _make_session(OPENALEX_BASE)
+_ICITE_SESSION = _make_session(ICITE_BASE)
+_SESSIONS = {
+    PUBMED_BASE: _PUBMED_SESSION,
+    OPENALEX_BASE: _OPENALEX_SESSION,
+    ICITE_BASE: _ICITE_SESSION,
+}
+
+
+
+class RateLimiter:
+    """
+    Thread-safe sliding-window rate limiter: at most `burst` (int(rate)) requests start
+    within any burst / rate seconds, so even after an idle spell the rate is never exceeded
+    """
+    
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.burst = max(1, int(rate))
+        # Start times of the most recent requests, some possibly reserved in the near future
+        self.starts = deque()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Reserve the next request start, sleeping until it comes round"""
+        # Each caller reserves its start time under the lock and sleeps outside it
+        with self.lock:
+            period = self.burst / self.rate
+            now = time.monotonic()
+            while self.starts and now - self.starts[0] >= period:
+                self.starts.popleft()
+            
+            if len(self.starts) < self.burst:
+                start = now
+            else:
+                start = self.starts.popleft() + period
+            self.starts.append(start)
+        
+        if start > now:
+            time.sleep(start - now)
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+# One limiter per host, so the rate limit holds across APISession instances and threads
+_LIMITERS: Dict[str, RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(base_url: str, rate_limit: float) -> RateLimiter:
+    """Return the shared rate limiter for base_url, following the latest rate for the host"""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(base_url)
+        if limiter is None:
+            limiter = _LIMITERS[base_url] = RateLimiter(rate_limit)
+        elif limiter.rate != rate_limit:
+            with limiter.lock:
+                limiter.rate = rate_limit
+                limiter.burst = max(1, int(rate_limit))
+        return limiter
+
+
+class TqdmLoggingHandler(logging.Handler):
+    """Log handler that writes through tqdm so log lines don't break an active progress bar"""
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            tqdm.write(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+_system_getaddrinfo = socket.getaddrinfo
+_DNS_CACHE_HOSTS = frozenset(urlsplit(base_url).hostname for base_url in (PUBMED_BASE, OPENALEX_BASE, ICITE_BASE))
+_dns_cache: Dict[Tuple, Tuple[float, list]] = {}
+_DNS_CACHE_LOCK = threading.Lock()
+
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    """getaddrinfo that reuses results for the API hosts for DNS_CACHE_TTL seconds"""
+    if host not in _DNS_CACHE_HOSTS:
+        return _system_getaddrinfo(host, port, *args, **kwargs)
+    
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _DNS_CACHE_LOCK:
+        entry = _dns_cache.get(key)
+    if entry is not None and now - entry[0] < DNS_CACHE_TTL:
+        return entry[1]
+    
+    result = _system_getaddrinfo(host, port, *args, **kwargs)
+    with _DNS_CACHE_LOCK:
+        _dns_cache[key] = (now, result)
+    return result
+
+
+def enable_dns_cache():
+    """Cache getaddrinfo for the three API hosts and resolve them once up front.
+
+    Pooled sessions rarely reconnect, but retries after 429/5xx do, and each new
+    socket would otherwise go back to the resolver. Only the API hosts are cached,
+    each for DNS_CACHE_TTL seconds; failed lookups are not cached.
+    """
+    if socket.getaddrinfo is not _cached_getaddrinfo:
+        socket.getaddrinfo = _cached_getaddrinfo
+    for host in _DNS_CACHE_HOSTS:
+        try:
+            socket.getaddrinfo(host, 443, 0, socket.SOCK_STREAM)
+        except OSError:
+            pass  # Left for the first request to report
+
+
+def enable_response_cache(cache_file: str = DEFAULT_CACHE_FILE):
+    """Swap the shared sessions for ones backed by a SQLite response cache"""
+    global _PUBMED_SESSION, _OPENALEX_SESSION, _ICITE_SESSION
+    
+    cache = requests_cache.SQLiteCache(cache_file)
+    for base_url in list(_SESSIONS):
+        _SESSIONS[base_url] = _make_session(base_url, cache)
+    _PUBMED_SESSION = _SESSIONS[PUBMED_BASE]
+    _OPENALEX_SESSION = _SESSIONS[OPENALEX_BASE]
+    _ICITE_SESSION = _SESSIONS[ICITE_BASE]
+
+
+def get_session(base_url: str) -> requests.Session:
+    """Return the shared session for base_url, creating one for unknown hosts"""
+    session = _SESSIONS.get(base_url)
+    if session is None:
+        session = _SESSIONS[base_url] = _make_session(base_url)
+    return session
+
 
 class APISession:
     """Manages API sessions with rate limiting and retry logic"""
     
-    def __init__(self, base_url: str, rate_limit: float, user_agent: str = None):
-        self.session = requests.Session()
+    def __init__(self, base_url: str, rate_limit: float, user_agent: str = None,
+                 session: Optional[requests.Session] = None):
+        self.session = session or get_session(base_url)
         self.base_url = base_url
         self.rate_limit = rate_limit
-        self.last_request_time = 0
-        
-        if user_agent:
-            self.session.headers.update({'User-Agent': user_agent})
-    
-    def _wait_for_rate_limit(self):
-        """Enforce rate limiting"""
-        if self.rate_limit > 0:
-            time_since_last = time.time() - self.last_request_time
-            min_interval = 1.0 / self.rate_limit
-            if time_since_last < min_interval:
-                time.sleep(min_interval - time_since_last)
-        self.last_request_time = time.time()
+        self.limiter = get_limiter(base_url, rate_limit) if rate_limit > 0 else None
+        self.headers = {'User-Agent': user_agent} if user_agent else None
     
     def request(self, method: str, url: str, **kwargs) -> requests.Response:
         """Make rate-limited request with retry logic"""
-        self._wait_for_rate_limit()
+        if self.limiter:
+            self.limiter.acquire()
         full_url = f"{self.base_url}/{url.lstrip('/')}" if not url.startswith('http') else url
+        if self.headers:
+            kwargs['headers'] = {**self.headers, **kwargs.get('headers', {})}
         return retry_request(self.session, method, full_url, **kwargs)
 
 
+def _as_count(value: Any) -> Optional[int]:
+    """Citation count as an int (missing counts as 0); None if the API sent something unparseable"""
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _loads(response: requests.Response) -> Any:
+    """Decode a JSON response body with orjson"""
+    return orjson.loads(response.content)
+
+
 def retry_request(session: requests.Session, method: str, url: str, max_retries: int = 5, **kwargs) -> requests.Response:
     """
     Retry HTTP requests with exponential backoff and jitter
@@ -88,7 +297,7 @@ def retry_request(session: requests.Session, method: str, url: str, max_retries:
                 else:
                     wait_time = min(60, (2 ** attempt) + random.uniform(0, 1))
                 
-                print(f"Rate limited, waiting {wait_time:.1f}s...")
+                logger.warning("Rate limited, waiting %.1fs...", wait_time)
                 time.sleep(wait_time)
                 continue
             
@@ -98,7 +307,7 @@ def retry_request(session: requests.Session, method: str, url: str, max_retries:
                     response.raise_for_status()
                 
                 wait_time = min(60, (2 ** attempt) + random.uniform(0, 1))
-                print(f"Server error {response.status_code}, retrying in {wait_time:.1f}s...")
+                logger.warning("Server error %s, retrying in %.1fs...", response.status_code, wait_time)
                 time.sleep(wait_time)
                 continue
             
@@ -110,7 +319,7 @@ def retry_request(session: requests.Session, method: str, url: str, max_retries:
                 raise
             
             wait_time = min(60, (2 ** attempt) + random.uniform(0, 1))
-            print(f"Request failed: {e}, retrying in {wait_time:.1f}s...")
+            logger.warning("Request failed: %s, retrying in %.1fs...", e, wait_time)
             time.sleep(wait_time)
     
     raise Exception("Max retries exceeded")
@@ -122,7 +331,7 @@ def build_pubmed_term(query: str, start_year: int, end_year: int) -> str:
 
 
 def pubmed_esearch(term: str, email: str, api_key: Optional[str] = None, retmax: int = 0, retstart: int = 0, 
-                  usehistory: bool = True) -> Dict[str, Any]:
+                  usehistory: bool = True, webenv: Optional[str] = None) -> Dict[str, Any]:
     """
     Execute PubMed ESearch query
     """
@@ -142,186 +351,177 @@ def pubmed_esearch(term: str, email: str, api_key: Optional[str] = None, retmax:
     if usehistory:
         params['usehistory'] = 'y'
     
+    # Lets the term reference earlier history queries as #<query_key>
+    if webenv:
+        params['WebEnv'] = webenv
+    
     if api_key:
         params['api_key'] = api_key
     
     response = session.request('GET', '/esearch.fcgi', params=params)
-    return response.json()
+    return _loads(response)
 
 
-def pubmed_year_counts(query: str, start_year: int, end_year: int, email: str, api_key: Optional[str] = None) -> Dict[str, int]:
+def pubmed_year_counts(query: str, start_year: int, end_year: int, email: str, api_key: Optional[str] = None,
+                       webenv: Optional[str] = None, query_key: Optional[str] = None) -> Dict[str, int]:
     """
     Get publication counts per year
-    """
-    year_counts = {}
     
-    for year in range(start_year, end_year + 1):
-        term = f'({query}[Title/Abstract]) AND ("{year}"[dp] : "{year}"[dp])'
+    With the WebEnv/query_key of an earlier search on the same query, each year is
+    narrowed from that history entry so NCBI does not re-translate the query. A year
+    whose search fails is logged and left out rather than counted as 0.
+    """
+    def year_count(year: int) -> Tuple[str, Optional[int]]:
+        if webenv and query_key:
+            # #<query_key> only resolves against the WebEnv when the search uses history
+            term = f'#{query_key} AND ("{year}"[dp] : "{year}"[dp])'
+            usehistory = True
+        else:
+            term = f'({query}[Title/Abstract]) AND ("{year}"[dp] : "{year}"[dp])'
+            usehistory = False
         try:
-            result = pubmed_esearch(term, email, api_key, retmax=0, usehistory=False)
-            count = int(result.get('esearchresult', {}).get('count', 0))
-            year_counts[str(year)] = count
+            result = pubmed_esearch(term, email, api_key, retmax=0, usehistory=usehistory,
+                                    webenv=webenv if usehistory else None)
+            return str(year), int(result['esearchresult']['count'])
         except Exception as e:
-            print(f"Warning: Failed to get count for year {year}: {e}")
-            year_counts[str(year)] = 0
+            logger.error("Failed to get count for year %s: %s", year, e)
+            return str(year), None
     
-    return year_counts
+    # One ESearch per year, issued concurrently; map keeps the years in order
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        return {year: count for year, count in executor.map(year_count, range(start_year, end_year + 1))
+                if count is not None}
 
 
-def pubmed_esummary_paged(webenv: str, query_key: str, page_size: int, email: str, 
-                         api_key: Optional[str] = None, max_records: Optional[int] = None) -> List[Dict[str, Any]]:
-    """
-    Fetch article summaries using ESummary with paging
+def _page_windows(total_count: int, page_size: int, max_records: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(retstart, retmax) of every page of a search history whose size is known"""
+    limit = min(total_count, max_records) if max_records else total_count
+    return [(retstart, min(page_size, limit - retstart)) for retstart in range(0, limit, page_size)]
+
+
+def _fetch_pages_concurrently(fetch_page, windows: List[Tuple[int, int]], workers: int) -> Iterator[Any]:
     """
-    rate_limit = NCBI_RATE_WITH_KEY if api_key else NCBI_RATE_WITHOUT_KEY
-    session = APISession(PUBMED_BASE, rate_limit)
+    Yield fetch_page(retstart, retmax) for each window in order, with at most `workers` pages in flight
     
-    articles = []
-    retstart = 0
+    Pages of the same WebEnv/query_key are independent, so they can be requested side by
+    side; the per-host rate limiter still caps the request rate.
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for window in windows:
+            pending.append(executor.submit(fetch_page, *window))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        
+        while pending:
+            yield pending.popleft().result()
+
+
+def _parse_efetch_article(article: etree._Element) -> Dict[str, Any]:
+    """Build an article record (same shape as ESummary's) from one PubmedArticle element"""
+    # ESummary names authors "LastName Initials"; collective authors keep their group name
+    authors = []
+    for author in _AUTHOR_XPATH(article):
+        name = ' '.join(filter(None, (author.findtext('LastName'), author.findtext('Initials'))))
+        authors.append({
+            'name': name or author.findtext('CollectiveName') or '',
+            'order': len(authors) + 1
+        })
     
-    with tqdm(desc="Fetching PubMed articles", unit="articles") as pbar:
-        while True:
-            if max_records and len(articles) >= max_records:
-                break
-            
-            current_page_size = min(page_size, max_records - len(articles)) if max_records else page_size
-            
-            params = {
-                'db': 'pubmed',
-                'query_key': query_key,
-                'WebEnv': webenv,
-                'retmode': 'json',
-                'retstart': retstart,
-                'retmax': current_page_size,
-                'email': email
-            }
-            
-            if api_key:
-                params['api_key'] = api_key
-            
-            try:
-                response = session.request('GET', '/esummary.fcgi', params=params)
-                data = response.json()
-                
-                result = data.get('result', {})
-                if not result or 'uids' not in result:
-                    break
-                
-                uids = result['uids']
-                if not uids:
-                    break
-                
-                for uid in uids:
-                    if uid in result:
-                        article_data = result[uid]
-                        
-                        # Extract authors
-                        authors = []
-                        author_list = article_data.get('authors', [])
-                        for i, author in enumerate(author_list):
-                            authors.append({
-                                'name': author.get('name', ''),
-                                'order': i + 1
-                            })
-                        
-                        # Extract publication year
-                        pub_year = None
-                        pub_date = article_data.get('pubdate', '')
-                        if pub_date:
-                            year_match = re.search(r'\b(19|20)\d{2}\b', pub_date)
-                            if year_match:
-                                pub_year = int(year_match.group())
-                        
-                        # Extract DOI from article IDs
-                        doi = None
-                        article_ids = article_data.get('articleids', [])
-                        for aid in article_ids:
-                            if aid.get('idtype') == 'doi':
-                                doi = aid.get('value')
-                                break
-                        
-                        article = {
-                            'pmid': uid,
-                            'title': article_data.get('title', ''),
-                            'journal': article_data.get('fulljournalname', ''),
-                            'pub_year': pub_year,
-                            'doi': doi,
-                            'authors': authors
-                        }
-                        
-                        articles.append(article)
-                        pbar.update(1)
-                
-                retstart += len(uids)
-                
-                if len(uids) < current_page_size:
-                    break
-                    
-            except Exception as e:
-                print(f"Error fetching articles at offset {retstart}: {e}")
-                break
+    # PubDate has either a Year or a free-text MedlineDate such as "2019 Jan-Feb"
+    pub_year = None
+    year_match = _YEAR_RE.search(_PUBDATE_XPATH(article))
+    if year_match:
+        pub_year = int(year_match.group())
     
-    return articles
+    return {
+        'pmid': _PMID_XPATH(article),
+        'title': _TITLE_XPATH(article),
+        'journal': _JOURNAL_XPATH(article),
+        'pub_year': pub_year,
+        'doi': _DOI_XPATH(article) or None,
+        'authors': authors
+    }
 
 
-def pubmed_efetch_doi_batch(pmids: List[str], email: str, api_key: Optional[str] = None) -> Dict[str, str]:
+def pubmed_efetch_paged_iter(webenv: str, query_key: str, page_size: int, email: str,
+                             api_key: Optional[str] = None, max_records: Optional[int] = None,
+                             total_count: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
     """
-    Fetch DOIs for articles using EFetch XML (for articles missing DOI in ESummary)
-    """
-    if not pmids:
-        return {}
+    Yield full article records (including DOIs) one EFetch page at a time over the search history
     
+    With the search's total_count the pages are fetched concurrently and still yielded in order.
+    """
     rate_limit = NCBI_RATE_WITH_KEY if api_key else NCBI_RATE_WITHOUT_KEY
     session = APISession(PUBMED_BASE, rate_limit)
     
-    dois = {}
-    
-    # Process in batches
-    for i in range(0, len(pmids), PUBMED_BATCH_SIZE):
-        batch_pmids = pmids[i:i + PUBMED_BATCH_SIZE]
-        
-        params = {
+    def fetch_page(retstart: int, retmax: int) -> Tuple[int, List[Dict[str, Any]]]:
+        # POST keeps the request small; the records come from the WebEnv, not an ID list
+        data = {
             'db': 'pubmed',
-            'id': ','.join(batch_pmids),
+            'query_key': query_key,
+            'WebEnv': webenv,
             'retmode': 'xml',
+            'retstart': retstart,
+            'retmax': retmax,
             'email': email
         }
         
         if api_key:
-            params['api_key'] = api_key
+            data['api_key'] = api_key
         
-        try:
-            response = session.request('GET', '/efetch.fcgi', params=params)
-            root = ET.fromstring(response.content)
+        response = session.request('POST', '/efetch.fcgi', data=data)
+        
+        # Book records count towards the page but carry no journal metadata
+        records = 0
+        page = []
+        for _, article in etree.iterparse(io.BytesIO(response.content),
+                                          tag=('PubmedArticle', 'PubmedBookArticle')):
+            records += 1
+            if article.tag == 'PubmedArticle':
+                page.append(_parse_efetch_article(article))
             
-            for article in root.findall('.//PubmedArticle'):
-                pmid_elem = article.find('.//PMID')
-                if pmid_elem is None:
-                    continue
-                
-                pmid = pmid_elem.text
-                doi = None
-                
-                # Look for DOI in ELocationID
-                for elocation in article.findall('.//ELocationID'):
-                    if elocation.get('EIdType') == 'doi':
-                        doi = elocation.text
-                        break
+            article.clear()
+            while article.getprevious() is not None:
+                del article.getparent()[0]
+        
+        return records, page
+    
+    with tqdm(desc="Fetching PubMed articles", unit="articles") as pbar:
+        if total_count is not None:
+            try:
+                for _, page in _fetch_pages_concurrently(fetch_page, _page_windows(total_count, page_size, max_records),
+                                                         min(MAX_WORKERS, rate_limit)):
+                    pbar.update(len(page))
+                    yield page
+            except Exception as e:
+                logger.error("Error fetching articles: %s", e)
+            return
+        
+        fetched = 0
+        retstart = 0
+        while True:
+            if max_records and fetched >= max_records:
+                break
+            
+            current_page_size = min(page_size, max_records - fetched) if max_records else page_size
+            
+            try:
+                records, page = fetch_page(retstart, current_page_size)
+                if not records:
+                    break
                 
-                # Look for DOI in ArticleIdList
-                if not doi:
-                    for article_id in article.findall('.//ArticleId'):
-                        if article_id.get('IdType') == 'doi':
-                            doi = article_id.text
-                            break
+                retstart += records
+                fetched += len(page)
+                pbar.update(len(page))
+                yield page
                 
-                if doi:
-                    dois[pmid] = doi
+                if records < current_page_size:
+                    break
                     
-        except Exception as e:
-            print(f"Error fetching DOIs for batch: {e}")
-    
-    return dois
+            except Exception as e:
+                logger.error("Error fetching articles at offset %d: %s", retstart, e)
+                break
 
 
 def openalex_works_by_pmid_bulk(pmids: List[str], email: str) -> Dict[str, Dict[str, Any]]:
@@ -334,9 +534,8 @@ def openalex_works_by_pmid_bulk(pmids: List[str], email: str) -> Dict[str, Dict[
     session = APISession(OPENALEX_BASE, OPENALEX_RATE, user_agent=email)
     openalex_data = {}
     
-    # Process in batches
-    for i in range(0, len(pmids), OPENALEX_BATCH_SIZE):
-        batch_pmids = pmids[i:i + OPENALEX_BATCH_SIZE]
+    def fetch_batch(batch_pmids: List[str]) -> Dict[str, Dict[str, Any]]:
+        batch_data = {}
         # Fix: Use correct format - just the PMID numbers separated by |
         pmid_filter = '|'.join(batch_pmids)
         
@@ -348,14 +547,19 @@ def openalex_works_by_pmid_bulk(pmids: List[str], email: str) -> Dict[str, Dict[
         
         try:
             response = session.request('GET', '/works', params=params)
-            data = response.json()
+            data = _loads(response)
             
             for work in data.get('results', []):
                 # Extract PMID from IDs
                 pmid = None
                 for id_entry in work.get('ids', {}).values():
                     if isinstance(id_entry, str) and 'pubmed' in id_entry.lower():
-                        pmid_match = re.search(r'(\d+)$', id_entry)
+                        # Usually https://pubmed.ncbi.nlm.nih.gov/<pmid>; the regex covers other forms
+                        tail = id_entry.rpartition('/')[2]
+                        if tail.isdigit():
+                            pmid = tail
+                            break
+                        pmid_match = _TRAILING_DIGITS_RE.search(id_entry)
                         if pmid_match:
                             pmid = pmid_match.group(1)
                             break
@@ -385,17 +589,25 @@ def openalex_works_by_pmid_bulk(pmids: List[str], email: str) -> Dict[str, Dict[
                         'institutions': institutions
                     })
                 
-                openalex_data[pmid] = {
+                batch_data[pmid] = {
                     'id': work.get('id', ''),
                     'doi': work.get('doi', ''),
-                    'cited_by_count': work.get('cited_by_count', 0),
+                    'cited_by_count': _as_count(work.get('cited_by_count')),
                     'is_retracted': work.get('is_retracted', False),
                     'concepts': concepts,
                     'authorships': authorships
                 }
                 
         except Exception as e:
-            print(f"Error fetching OpenAlex data for batch: {e}")
+            logger.error("Error fetching OpenAlex data for batch: %s", e)
+        
+        return batch_data
+    
+    # Batches are independent, so they run concurrently under the shared rate limit
+    batches = [pmids[i:i + OPENALEX_BATCH_SIZE] for i in range(0, len(pmids), OPENALEX_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for batch_data in executor.map(fetch_batch, batches):
+            openalex_data.update(batch_data)
     
     return openalex_data
 
@@ -410,147 +622,255 @@ def icite_citations_bulk(pmids: List[str]) -> Dict[str, Dict[str, Any]]:
     session = APISession(ICITE_BASE, ICITE_RATE)
     icite_data = {}
     
-    # Process in batches
-    for i in range(0, len(pmids), ICITE_BATCH_SIZE):
-        batch_pmids = pmids[i:i + ICITE_BATCH_SIZE]
-        
+    def fetch_batch(batch_pmids: List[str]) -> Dict[str, Dict[str, Any]]:
+        batch_data = {}
         params = {
             'pmids': ','.join(batch_pmids)
         }
         
         try:
             response = session.request('GET', '/api/pubs', params=params)
-            data = response.json()
+            data = _loads(response)
             
             for article in data.get('data', []):
                 pmid = str(article.get('pmid', ''))
                 if pmid:
-                    icite_data[pmid] = {
-                        'cited_by': article.get('cited_by', 0)
+                    batch_data[pmid] = {
+                        'cited_by': _as_count(article.get('cited_by'))
                     }
                     
         except Exception as e:
-            print(f"Error fetching iCite data for batch: {e}")
+            logger.error("Error fetching iCite data for batch: %s", e)
+        
+        return batch_data
+    
+    batches = [pmids[i:i + ICITE_BATCH_SIZE] for i in range(0, len(pmids), ICITE_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for batch_data in executor.map(fetch_batch, batches):
+            icite_data.update(batch_data)
     
     return icite_data
 
 
+def _pick_openalex_first(oa: np.ndarray, ic: np.ndarray, oa_mask: np.ndarray, ic_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.where(oa_mask, oa, ic), np.where(oa_mask, "openalex", "icite")
+
+
+def _pick_icite_first(oa: np.ndarray, ic: np.ndarray, oa_mask: np.ndarray, ic_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.where(ic_mask, ic, oa), np.where(ic_mask, "icite", "openalex")
+
+
+def _pick_both(oa: np.ndarray, ic: np.ndarray, oa_mask: np.ndarray, ic_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.where(oa_mask, oa, ic), np.full(len(oa), "both")
+
+
+def _reconcile_values(oa: np.ndarray, ic: np.ndarray) -> np.ndarray:
+    """Mean of the two counts when they are within 10% of the lower one, otherwise the higher"""
+    hi, lo = np.maximum(oa, ic), np.minimum(oa, ic)
+    ratio = np.divide(hi - lo, lo, out=np.full(len(oa), np.inf), where=lo > 0)
+    return np.where(ratio <= 0.10, np.rint((oa + ic) / 2).astype(np.int64), hi)
+
+
+# Selection by --citationssource, overridden by --citationspolicy
+_DEFAULT_PICKS = {
+    "openalex": _pick_openalex_first,
+    "icite": _pick_icite_first,
+    "both": _pick_both,
+}
+_POLICY_PICKS = {
+    "prefer_openalex": _pick_openalex_first,
+    "prefer_icite": _pick_icite_first,
+}
+_RECONCILERS = {
+    "max": np.maximum,
+    "min": np.minimum,
+    "reconcile": _reconcile_values,
+}
+
+
 def unify_citations(openalex_map: Dict[str, Dict[str, Any]], icite_map: Dict[str, Dict[str, Any]], 
                    policy: str, default_source: str, now_iso: str) -> Dict[str, Dict[str, Any]]:
     """
     Unify citation counts from OpenAlex and iCite based on policy
     """
+    # Counts in both maps were normalized to int (or None if unparseable) when fetched
+    pmids = list(openalex_map.keys() | icite_map.keys())
+    if not pmids:
+        return {}
+    
+    oa_vals = [openalex_map[pmid].get("cited_by_count", 0) if pmid in openalex_map else None for pmid in pmids]
+    ic_vals = [icite_map[pmid].get("cited_by", 0) if pmid in icite_map else None for pmid in pmids]
+    
+    # Aligned arrays with a presence mask; absent values are 0, which is also what a
+    # missing pick resolves to
+    oa_mask = np.array([v is not None for v in oa_vals])
+    ic_mask = np.array([v is not None for v in ic_vals])
+    oa = np.array([v if v is not None else 0 for v in oa_vals], dtype=np.int64)
+    ic = np.array([v if v is not None else 0 for v in ic_vals], dtype=np.int64)
+    both = oa_mask & ic_mask
+    
+    discrepancy = np.where(both, np.abs(oa - ic), 0)
+    
+    # Default selection, then policy overrides; max/min/reconcile only apply where both
+    # sources have a value. Each choice is resolved once for the whole array
+    n = len(pmids)
+    default_fn = _DEFAULT_PICKS.get(default_source)
+    if default_fn:
+        pick, source_of_truth = default_fn(oa, ic, oa_mask, ic_mask)
+    else:
+        pick, source_of_truth = np.zeros(n, dtype=np.int64), np.full(n, default_source)
+    
+    policy_fn = _POLICY_PICKS.get(policy)
+    reconcile_fn = _RECONCILERS.get(policy)
+    if policy_fn:
+        pick, source_of_truth = policy_fn(oa, ic, oa_mask, ic_mask)
+    elif reconcile_fn:
+        pick = np.where(both, reconcile_fn(oa, ic), pick)
+        source_of_truth = np.where(both, "reconciled", source_of_truth)
+    
+    # A source with no value gives the same entry for every PMID, so it is built once and
+    # shared; with a single citation source this skips half of the per-PMID allocations
+    missing = {"value": None, "fetched_at": now_iso}
+    
     results = {}
-    for pmid in set(list(openalex_map.keys()) + list(icite_map.keys())):
-        oa_val = None
-        if pmid in openalex_map:
-            try: 
-                oa_val = int(openalex_map[pmid].get("cited_by_count") or 0)
-            except: 
-                oa_val = None
-        
-        ic_val = None
-        if pmid in icite_map:
-            try: 
-                ic_val = int(icite_map[pmid].get("cited_by") or 0)
-            except: 
-                ic_val = None
-        
-        sources = {
-            "openalex": {"value": oa_val, "fetched_at": now_iso},
-            "icite": {"value": ic_val, "fetched_at": now_iso}
-        }
-        
-        discrepancy = abs(oa_val - ic_val) if oa_val is not None and ic_val is not None else 0
-        pick, source_of_truth = None, default_source
-        
-        # Default selection
-        if default_source == "openalex":
-            pick, source_of_truth = (oa_val, "openalex") if oa_val is not None else (ic_val, "icite")
-        elif default_source == "icite":
-            pick, source_of_truth = (ic_val, "icite") if ic_val is not None else (oa_val, "openalex")
-        elif default_source == "both":
-            pick, source_of_truth = (oa_val, "both") if oa_val is not None else (ic_val, "both")
-        
-        # Policy overrides
-        if policy == "prefer_openalex":
-            pick, source_of_truth = (oa_val, "openalex") if oa_val is not None else (ic_val, "icite")
-        elif policy == "prefer_icite":
-            pick, source_of_truth = (ic_val, "icite") if ic_val is not None else (oa_val, "openalex")
-        elif policy == "max" and oa_val is not None and ic_val is not None:
-            pick, source_of_truth = (max(oa_val, ic_val), "reconciled")
-        elif policy == "min" and oa_val is not None and ic_val is not None:
-            pick, source_of_truth = (min(oa_val, ic_val), "reconciled")
-        elif policy == "reconcile" and oa_val is not None and ic_val is not None:
-            hi, lo = max(oa_val, ic_val), min(oa_val, ic_val)
-            if lo > 0 and (hi - lo) / lo <= 0.10:
-                pick = round((oa_val + ic_val) / 2)
-            else:
-                pick = hi
-            source_of_truth = "reconciled"
-        
+    for pmid, oa_val, ic_val, value, source, disc in zip(pmids, oa_vals, ic_vals, pick.tolist(),
+                                                          source_of_truth.tolist(), discrepancy.tolist()):
         results[pmid] = {
-            "value": pick or 0,
-            "source_of_truth": source_of_truth,
-            "sources": sources,
-            "discrepancy": discrepancy
+            "value": value,
+            "source_of_truth": source,
+            "sources": {
+                "openalex": {"value": oa_val, "fetched_at": now_iso} if oa_val is not None else missing,
+                "icite": {"value": ic_val, "fetched_at": now_iso} if ic_val is not None else missing
+            },
+            "discrepancy": disc
         }
     
     return results
 
 
+@dataclass(slots=True)
+class OpenAlexInfo:
+    """OpenAlex fields kept on a merged article"""
+    id: str
+    cited_by_count: Optional[int]
+    is_retracted: bool
+    concepts: List[str]
+
+
+@dataclass(slots=True)
+class Article:
+    """A merged article record; slots keep per-item memory down on large harvests"""
+    pmid: str
+    title: str
+    journal: str
+    pub_year: Optional[int]
+    doi: Optional[str]
+    authors: List[Dict[str, Any]]
+    openalex: Optional[OpenAlexInfo] = None
+    icite: Optional[Dict[str, Any]] = None
+    citations: Optional[Dict[str, Any]] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Output form: openalex/icite keys are left out when that source had no record"""
+        data = {
+            'pmid': self.pmid,
+            'title': self.title,
+            'journal': self.journal,
+            'pub_year': self.pub_year,
+            'doi': self.doi,
+            'authors': self.authors
+        }
+        if self.openalex is not None:
+            data['openalex'] = {
+                'id': self.openalex.id,
+                'cited_by_count': self.openalex.cited_by_count,
+                'is_retracted': self.openalex.is_retracted,
+                'concepts': self.openalex.concepts
+            }
+        if self.icite is not None:
+            data['icite'] = self.icite
+        data['citations'] = self.citations
+        return data
+
+
+def _json_default(obj: Any) -> Any:
+    """orjson hook: articles are converted to their output dicts only while being written"""
+    if isinstance(obj, Article):
+        return obj.to_dict()
+    raise TypeError
+
+
+# Dataclasses go through _json_default rather than orjson's field-by-field dump
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO-8601 string with a Z suffix"""
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+def _openalex_side_table(openalex_map: Dict[str, Dict[str, Any]]) -> Dict[str, Tuple[OpenAlexInfo, str, List[Tuple[str, List]]]]:
+    """
+    Prepack each OpenAlex entry in one pass as (info, doi, [(author_id, institutions), ...])
+    """
+    side = {}
+    for pmid, openalex_data in openalex_map.items():
+        if not openalex_data:
+            continue
+        
+        info = OpenAlexInfo(
+            id=openalex_data.get('id', ''),
+            cited_by_count=openalex_data.get('cited_by_count', 0),
+            is_retracted=openalex_data.get('is_retracted', False),
+            concepts=openalex_data.get('concepts', [])
+        )
+        authorships = [(authorship.get('author_id', ''), authorship.get('institutions', []))
+                       for authorship in openalex_data.get('authorships', [])]
+        side[pmid] = (info, openalex_data.get('doi'), authorships)
+    
+    return side
+
+
 def merge_records(pubmed_items: List[Dict[str, Any]], openalex_map: Dict[str, Dict[str, Any]], 
-                 icite_map: Dict[str, Dict[str, Any]], citations_source: str, citations_policy: str) -> List[Dict[str, Any]]:
+                 icite_map: Dict[str, Dict[str, Any]], citations_source: str, citations_policy: str,
+                 now_iso: Optional[str] = None) -> List[Article]:
     """
     Merge PubMed, OpenAlex, and iCite data
     """
-    now_iso = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    now_iso = now_iso or utc_now_iso()
     citations_map = unify_citations(openalex_map, icite_map, citations_policy, citations_source, now_iso)
     
+    openalex_side = _openalex_side_table(openalex_map)
+    
     merged_items = []
     
     for item in pubmed_items:
         pmid = item['pmid']
-        merged_item = item.copy()
+        merged_item = Article(**item)
         
         # Add OpenAlex data
-        openalex_data = openalex_map.get(pmid, {})
-        if openalex_data:
+        side = openalex_side.get(pmid)
+        if side:
+            info, oa_doi, authorships = side
+            
             # Enrich DOI if missing
-            if not merged_item.get('doi') and openalex_data.get('doi'):
-                merged_item['doi'] = openalex_data['doi']
+            if not merged_item.doi and oa_doi:
+                merged_item.doi = oa_doi
             
-            # Add OpenAlex author IDs and institutions to existing authors
-            openalex_authorships = openalex_data.get('authorships', [])
-            for i, author in enumerate(merged_item.get('authors', [])):
-                if i < len(openalex_authorships):
-                    authorship = openalex_authorships[i]
-                    author['openalex_author_id'] = authorship.get('author_id', '')
-                    author['institutions'] = authorship.get('institutions', [])
+            # Add OpenAlex author IDs and institutions to existing authors, matched by position
+            for author, (author_id, institutions) in zip(merged_item.authors or [], authorships):
+                author['openalex_author_id'] = author_id
+                author['institutions'] = institutions
             
-            merged_item['openalex'] = {
-                'id': openalex_data.get('id', ''),
-                'cited_by_count': openalex_data.get('cited_by_count', 0),
-                'is_retracted': openalex_data.get('is_retracted', False),
-                'concepts': openalex_data.get('concepts', [])
-            }
+            merged_item.openalex = info
         
         # Add iCite data
-        icite_data = icite_map.get(pmid, {})
+        icite_data = icite_map.get(pmid)
         if icite_data:
-            merged_item['icite'] = icite_data
+            merged_item.icite = icite_data
         
         # Add unified citations
-        c = citations_map.get(pmid)
-        merged_item["citations"] = c
-        
-        # Handle citation source preferences
-        if citations_source == 'openalex' and not openalex_data and icite_data:
-            # Fallback to iCite if OpenAlex not available
-            pass
-        elif citations_source == 'icite' and not icite_data and openalex_data:
-            # Fallback to OpenAlex if iCite not available
-            pass
+        merged_item.citations = citations_map.get(pmid)
         
         merged_items.append(merged_item)
     
@@ -561,26 +881,26 @@ def save_json(payload: Dict[str, Any], file_path: str):
     """
     Save data to JSON file with proper formatting
     """
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
+    with open(file_path, 'wb') as f:
+        f.write(orjson.dumps(payload, default=_json_default, option=orjson.OPT_INDENT_2 | _ORJSON_OPTIONS))
 
 
-def print_summary(payload: Dict[str, Any]):
+def _item_citations(item: Union[Article, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Citations block of a merged item, whether it is an Article or an already-dumped dict"""
+    if isinstance(item, Article):
+        return item.citations
+    return item.get('citations')
+
+
+def citation_stats(citations_list: Iterable[Optional[Dict[str, Any]]]) -> Tuple[int, int]:
     """
-    Print a summary of the harvesting results
+    Count items with both citation sources, and those whose sources differ by >10%
     """
-    total_count = payload.get('pubmed', {}).get('total_count', 0)
-    fetched_count = payload.get('pubmed', {}).get('fetched_count', 0)
-    year_counts = payload.get('pubmed', {}).get('year_counts', {})
-    citations_source = payload.get('citations', {}).get('source_of_truth', 'N/A')
-    
-    # Calculate citation statistics
-    items = payload.get('items', [])
     both_sources_count = 0
     high_discrepancy_count = 0
     
-    for item in items:
-        citations = item.get('citations', {})
+    for citations in citations_list:
+        citations = citations or {}
         sources = citations.get('sources', {})
         
         oa_val = sources.get('openalex', {}).get('value')
@@ -594,6 +914,97 @@ def print_summary(payload: Dict[str, Any]):
                 if discrepancy_pct > 0.10:
                     high_discrepancy_count += 1
     
+    return both_sources_count, high_discrepancy_count
+
+
+def jsonl_paths(outfile: str) -> Tuple[str, str]:
+    """Item and metadata file names for JSONL output, e.g. results.jsonl + results.meta.json"""
+    root = os.path.splitext(outfile)[0]
+    return f"{root}.jsonl", f"{root}.meta.json"
+
+
+def enrich_batch(articles: List[Dict[str, Any]], citations_source: str, citations_policy: str,
+                 openalex_email: str, now_iso: str) -> List[Article]:
+    """
+    Fetch OpenAlex/iCite data for one batch of PubMed records and merge it in
+    """
+    pmids = [article['pmid'] for article in articles]
+    openalex_map = {}
+    icite_map = {}
+    
+    # OpenAlex and iCite are different hosts, so both fetches run side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        openalex_future = icite_future = None
+        if citations_source in ['openalex', 'both']:
+            openalex_future = executor.submit(openalex_works_by_pmid_bulk, pmids, openalex_email)
+        if citations_source in ['icite', 'both']:
+            icite_future = executor.submit(icite_citations_bulk, pmids)
+        
+        if openalex_future:
+            openalex_map = openalex_future.result()
+        if icite_future:
+            icite_map = icite_future.result()
+    
+    return merge_records(articles, openalex_map, icite_map, citations_source, citations_policy, now_iso)
+
+
+def enrich_pages(pages: Iterable[List[Dict[str, Any]]], citations_source: str, citations_policy: str,
+                 openalex_email: str, now_iso: str) -> Iterator[List[Article]]:
+    """
+    Yield enriched pages in order, pipelined with the PubMed fetch
+    
+    Each page's citation lookups start in a worker as soon as the page arrives, while
+    the caller's thread goes on fetching the next PubMed pages.
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=PIPELINE_DEPTH) as executor:
+        for page in pages:
+            pending.append(executor.submit(enrich_batch, page, citations_source, citations_policy,
+                                           openalex_email, now_iso))
+            if len(pending) >= PIPELINE_DEPTH:
+                yield pending.popleft().result()
+        
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_jsonl_items(merged_pages: Iterable[List[Article]], items_file: str) -> Tuple[int, int, int]:
+    """
+    Append each page of merged items to a JSONL file as soon as it is ready
+    
+    Returns the number of items written and their citation statistics.
+    """
+    fetched_count = both_sources_count = high_discrepancy_count = 0
+    
+    with open(items_file, 'wb') as f:
+        for merged_items in merged_pages:
+            f.write(b''.join(orjson.dumps(item, default=_json_default, option=_ORJSON_OPTIONS) + b'\n'
+                             for item in merged_items))
+            
+            both, high = citation_stats(_item_citations(item) for item in merged_items)
+            fetched_count += len(merged_items)
+            both_sources_count += both
+            high_discrepancy_count += high
+    
+    return fetched_count, both_sources_count, high_discrepancy_count
+
+
+def print_summary(payload: Dict[str, Any]):
+    """
+    Print a summary of the harvesting results
+    """
+    total_count = payload.get('pubmed', {}).get('total_count', 0)
+    fetched_count = payload.get('pubmed', {}).get('fetched_count', 0)
+    year_counts = payload.get('pubmed', {}).get('year_counts', {})
+    citations_source = payload.get('citations', {}).get('source_of_truth', 'N/A')
+    
+    # Calculate citation statistics; JSONL metadata carries the counts gathered while streaming
+    if 'items' in payload or 'citation_stats' not in payload:
+        both_sources_count, high_discrepancy_count = citation_stats(_item_citations(item) for item in payload.get('items', []))
+    else:
+        both_sources_count = payload['citation_stats'].get('both_sources', 0)
+        high_discrepancy_count = payload['citation_stats'].get('high_discrepancy', 0)
+    
     print("\n" + "="*50)
     print("LITERATURE HARVESTER SUMMARY")
     print("="*50)
@@ -647,9 +1058,16 @@ def main():
     parser.add_argument('--ncbiapikey', help='NCBI API key (or set NCBI_API_KEY env var)')
     parser.add_argument('--maxrecords', type=int, 
                        help='Maximum number of records to fetch (for development)')
+    parser.add_argument('--jsonl', action='store_true',
+                       help='Stream items to <outfile>.jsonl with header data in <outfile>.meta.json')
+    parser.add_argument('--no-cache', action='store_true',
+                       help=f'Bypass the on-disk response cache ({DEFAULT_CACHE_FILE})')
     
     args = parser.parse_args()
     
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s',
+                        handlers=[TqdmLoggingHandler()])
+    
     # Get email from argument, environment, or prompt user
     email = args.email or os.getenv('ENTREZ_EMAIL')
     if not email:
@@ -671,73 +1089,89 @@ def main():
     if api_key:
         print(f"Using NCBI API key: {api_key[:8]}...")
     
+    enable_dns_cache()
+    if not args.no_cache:
+        enable_response_cache()
+    now_iso = utc_now_iso()
+    
     try:
         # Step 1: Get total counts and year-by-year breakdown
         print("\n1. Getting publication counts...")
         search_term = build_pubmed_term(args.query, args.startyear, args.endyear)
         
-        # Get total count
-        search_result = pubmed_esearch(search_term, email, api_key, retmax=0)
-        total_count = int(search_result.get('esearchresult', {}).get('count', 0))
+        # Get total count; the search is stored in history for the per-year queries and
+        # for paging in step 2
+        search_result = pubmed_esearch(search_term, email, api_key, retmax=0, usehistory=True)
+        esearch_result = search_result.get('esearchresult', {})
+        total_count = int(esearch_result.get('count', 0))
+        webenv = esearch_result.get('webenv')
+        query_key = esearch_result.get('querykey')
         
         # Get year-by-year counts
-        year_counts = pubmed_year_counts(args.query, args.startyear, args.endyear, email, api_key)
+        year_counts = pubmed_year_counts(args.query, args.startyear, args.endyear, email, api_key,
+                                         webenv=webenv, query_key=query_key)
         
         print(f"Found {total_count:,} total articles")
         
         # Step 2: Fetch article details
         print("\n2. Fetching article details...")
         
-        # Get search history for paging
-        search_result = pubmed_esearch(search_term, email, api_key, retmax=0, usehistory=True)
-        webenv = search_result.get('esearchresult', {}).get('webenv')
-        query_key = search_result.get('esearchresult', {}).get('querykey')
-        
         if not webenv or not query_key:
             print("Error: Could not establish search history")
             return 1
         
-        # Fetch articles using ESummary
-        articles = pubmed_esummary_paged(webenv, query_key, args.pagesize, email, api_key, args.maxrecords)
-        
-        print(f"Fetched {len(articles)} article summaries")
+        # Use email from environment for OpenAlex if available
+        openalex_email = os.getenv('OPENALEX_MAILTO', email)
         
-        # Step 3: Fetch missing DOIs
-        print("\n3. Fetching missing DOIs...")
-        missing_doi_pmids = [article['pmid'] for article in articles if not article.get('doi')]
+        # Fetch articles with EFetch, which carries DOIs so no second DOI pass is needed.
+        # OpenAlex/iCite lookups for each page overlap with fetching the next ones
+        pages = pubmed_efetch_paged_iter(webenv, query_key, args.pagesize, email, api_key, args.maxrecords,
+                                         total_count=total_count)
+        merged_pages = enrich_pages(pages, args.citationssource, args.citationspolicy, openalex_email, now_iso)
         
-        if missing_doi_pmids:
-            print(f"Fetching DOIs for {len(missing_doi_pmids)} articles...")
-            doi_map = pubmed_efetch_doi_batch(missing_doi_pmids, email, api_key)
+        if args.jsonl:
+            # Write each merged page as it arrives rather than holding the whole harvest
+            items_file, meta_file = jsonl_paths(args.outfile)
+            print(f"Streaming enriched records to {items_file}...")
+            fetched_count, both_sources_count, high_discrepancy_count = write_jsonl_items(merged_pages, items_file)
             
-            # Update articles with DOIs
-            for article in articles:
-                if not article.get('doi') and article['pmid'] in doi_map:
-                    article['doi'] = doi_map[article['pmid']]
-        
-        # Step 4: Fetch citation data
-        pmids = [article['pmid'] for article in articles]
-        openalex_map = {}
-        icite_map = {}
+            payload = {
+                'query': args.query,
+                'year_range': {
+                    'start': args.startyear,
+                    'end': args.endyear
+                },
+                'pubmed': {
+                    'total_count': total_count,
+                    'year_counts': year_counts,
+                    'fetched_count': fetched_count
+                },
+                'citations': {
+                    'source_of_truth': args.citationssource
+                },
+                'citation_stats': {
+                    'both_sources': both_sources_count,
+                    'high_discrepancy': high_discrepancy_count
+                },
+                'items_file': items_file,
+                'output_file': meta_file
+            }
+            save_json(payload, meta_file)
+            
+            print_summary(payload)
+            
+            return 0
         
-        # Use email from environment for OpenAlex if available
-        openalex_email = os.getenv('OPENALEX_MAILTO', email)
+        # Collect the merged pages (still part of step 2)
+        merged_items = [item for merged_page in merged_pages for item in merged_page]
         
+        print(f"Fetched and merged {len(merged_items)} article records")
         if args.citationssource in ['openalex', 'both']:
-            print("\n4. Fetching OpenAlex data...")
-            openalex_map = openalex_works_by_pmid_bulk(pmids, openalex_email)
-            print(f"Retrieved OpenAlex data for {len(openalex_map)} articles")
-        
+            print(f"Retrieved OpenAlex data for {sum(item.openalex is not None for item in merged_items)} articles")
         if args.citationssource in ['icite', 'both']:
-            print("\n5. Fetching iCite data...")
-            icite_map = icite_citations_bulk(pmids)
-            print(f"Retrieved iCite data for {len(icite_map)} articles")
-        
-        # Step 5: Merge all data
-        print("\n6. Merging data...")
-        merged_items = merge_records(articles, openalex_map, icite_map, args.citationssource, args.citationspolicy)
+            print(f"Retrieved iCite data for {sum(item.icite is not None for item in merged_items)} articles")
         
-        # Step 6: Create output payload
+        # Create output payload
         payload = {
             'query': args.query,
             'year_range': {
@@ -756,8 +1190,8 @@ def main():
             'output_file': args.outfile
         }
         
-        # Step 7: Save and summarize
-        print(f"\n7. Saving results to {args.outfile}...")
+        # Step 3: Save and summarize
+        print(f"\n3. Saving results to {args.outfile}...")
         save_json(payload, args.outfile)
         
         print_summary(payload)
@@ -4,12 +4,10 @@ Contains all constants, API endpoints, and configuration settings.
 """
 
 import os
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
 # API Endpoints
 PUBMED_BASE = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
 OPENALEX_BASE = "https://api.openalex.org"
@@ -23,9 +21,28 @@ ICITE_RATE = 10
 
 # Batch sizes - Updated to maximum allowed values
 PUBMED_BATCH_SIZE = 10000  # Maximum for ESummary per NCBI documentation
-OPENALEX_BATCH_SIZE = 200
+OPENALEX_BATCH_SIZE = 100  # OpenAlex accepts up to 100 values in one OR filter
+OPENALEX_PAGE_SIZE = 200  # Maximum works per page
 ICITE_BATCH_SIZE = 500
 
+# Adaptive batch sizing: batches grow while responses come back faster than the
+# target latency and shrink by 10% after a slow or failed one
+OPENALEX_BATCH_SIZE_MIN = 25
+OPENALEX_BATCH_SIZE_MAX = 100
+ICITE_BATCH_SIZE_MIN = 50
+ICITE_BATCH_SIZE_MAX = 1000
+BATCH_TARGET_LATENCY = 2.0  # seconds
+
+# Optional on-disk HTTP cache for E-utilities responses (off unless a path is set).
+# WebEnv is part of each ESummary URL, so cached pages are reused only together with
+# a cached ESearch for the same query
+HTTP_CACHE_FILE = None
+HTTP_CACHE_EXPIRE_AFTER = {
+    '*/esearch.fcgi': 3600,
+    '*/esummary.fcgi': 7 * 86400,
+    '*/efetch.fcgi': 30 * 86400,
+}
+
 # Default values
 DEFAULT_PAGE_SIZE = 10000  # Updated to match maximum batch size
 DEFAULT_OUTPUT_FILE = "results.json"
@@ -33,13 +50,27 @@ DEFAULT_CITATIONS_SOURCE = "openalex"
 DEFAULT_CITATIONS_POLICY = "prefer_openalex"
 
 
+@lru_cache(maxsize=1)
+def _load_env() -> Dict[str, Optional[str]]:
+    """Load .env and read the harvester's environment variables, once per process"""
+    load_dotenv()
+    return {
+        'email': os.getenv('ENTREZ_EMAIL'),
+        'ncbi_api_key': os.getenv('NCBI_API_KEY'),
+        'openalex_mailto': os.getenv('OPENALEX_MAILTO'),
+    }
+
+
 class Config:
     """Configuration class for Literature Harvester"""
     
+    _instance: Optional['Config'] = None
+    
     def __init__(self):
-        self.email = os.getenv('ENTREZ_EMAIL')
-        self.ncbi_api_key = os.getenv('NCBI_API_KEY')
-        self.openalex_email = os.getenv('OPENALEX_MAILTO', self.email)
+        env = _load_env()
+        self.email = env['email']
+        self.ncbi_api_key = env['ncbi_api_key']
+        self.openalex_email = env['openalex_mailto'] if env['openalex_mailto'] is not None else self.email
         
         # API settings
         self.pubmed_base = PUBMED_BASE
@@ -54,7 +85,17 @@ class Config:
         # Batch sizes
         self.pubmed_batch_size = PUBMED_BATCH_SIZE
         self.openalex_batch_size = OPENALEX_BATCH_SIZE
+        self.openalex_page_size = OPENALEX_PAGE_SIZE
         self.icite_batch_size = ICITE_BATCH_SIZE
+        self.openalex_batch_size_min = OPENALEX_BATCH_SIZE_MIN
+        self.openalex_batch_size_max = OPENALEX_BATCH_SIZE_MAX
+        self.icite_batch_size_min = ICITE_BATCH_SIZE_MIN
+        self.icite_batch_size_max = ICITE_BATCH_SIZE_MAX
+        self.batch_target_latency = BATCH_TARGET_LATENCY
+        
+        # HTTP cache
+        self.http_cache_file = HTTP_CACHE_FILE
+        self.http_cache_expire_after = dict(HTTP_CACHE_EXPIRE_AFTER)
         
         # Defaults
         self.default_page_size = DEFAULT_PAGE_SIZE
@@ -62,6 +103,13 @@ class Config:
         self.default_citations_source = DEFAULT_CITATIONS_SOURCE
         self.default_citations_policy = DEFAULT_CITATIONS_POLICY
     
+    @classmethod
+    def instance(cls) -> 'Config':
+        """Shared configuration, created on first use and reused by later harvesters"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+    
     def validate(self) -> bool:
         """Validate configuration"""
         if not self.email:
@@ -3,105 +3,151 @@ Data processing module for Literature Harvester
 Handles data merging, citation unification, and output formatting.
 """
 
-import json
-from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from .utils import utc_now_iso
+
+
+def prefer_openalex(oa: np.ndarray, ic: np.ndarray, oa_mask: np.ndarray, ic_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """OpenAlex count, falling back to iCite"""
+    return np.where(oa_mask, oa, ic), np.where(oa_mask, "openalex", "icite")
+
+
+def prefer_icite(oa: np.ndarray, ic: np.ndarray, oa_mask: np.ndarray, ic_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """iCite count, falling back to OpenAlex"""
+    return np.where(ic_mask, ic, oa), np.where(ic_mask, "icite", "openalex")
+
+
+def either_source(oa: np.ndarray, ic: np.ndarray, oa_mask: np.ndarray, ic_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Whichever count is available, OpenAlex first"""
+    return np.where(oa_mask, oa, ic), np.full(len(oa), "both")
+
+
+def reconcile_counts(oa: np.ndarray, ic: np.ndarray) -> np.ndarray:
+    """Mean of two counts within 10% of each other, otherwise the higher one"""
+    hi, lo = np.maximum(oa, ic), np.minimum(oa, ic)
+    ratio = np.divide(hi - lo, lo, out=np.full(len(oa), np.inf), where=lo > 0)
+    return np.where(ratio <= 0.10, np.rint((oa + ic) / 2).astype(np.int64), hi)
+
+
+# Selection by citations source, and the policies that override it
+DEFAULT_FNS = {
+    "openalex": prefer_openalex,
+    "icite": prefer_icite,
+    "both": either_source,
+}
+POLICY_FNS = {
+    "prefer_openalex": prefer_openalex,
+    "prefer_icite": prefer_icite,
+}
+# Policies that combine the two counts, used only where both are present
+RECONCILE_FNS = {
+    "max": np.maximum,
+    "min": np.minimum,
+    "reconcile": reconcile_counts,
+}
 
 
 def unify_citations(openalex_map: Dict[str, Dict[str, Any]], icite_map: Dict[str, Dict[str, Any]], 
                    policy: str, default_source: str, now_iso: str) -> Dict[str, Dict[str, Any]]:
     """
     Unify citation counts from OpenAlex and iCite based on policy
+    
+    Counts are laid out as aligned arrays so the selection runs over all PMIDs at once.
     """
-    results = {}
-    for pmid in set(list(openalex_map.keys()) + list(icite_map.keys())):
-        oa_val = None
-        if pmid in openalex_map:
-            try: 
-                oa_val = int(openalex_map[pmid].get("cited_by_count") or 0)
-            except: 
-                oa_val = None
-        
-        ic_val = None
-        if pmid in icite_map:
-            try: 
-                ic_val = int(icite_map[pmid].get("cited_by") or 0)
-            except: 
-                ic_val = None
-        
-        sources = {
-            "openalex": {"value": oa_val, "fetched_at": now_iso},
-            "icite": {"value": ic_val, "fetched_at": now_iso}
-        }
-        
-        discrepancy = abs(oa_val - ic_val) if oa_val is not None and ic_val is not None else 0
-        pick, source_of_truth = None, default_source
-        
-        # Default selection
-        if default_source == "openalex":
-            pick, source_of_truth = (oa_val, "openalex") if oa_val is not None else (ic_val, "icite")
-        elif default_source == "icite":
-            pick, source_of_truth = (ic_val, "icite") if ic_val is not None else (oa_val, "openalex")
-        elif default_source == "both":
-            pick, source_of_truth = (oa_val, "both") if oa_val is not None else (ic_val, "both")
-        
-        # Policy overrides
-        if policy == "prefer_openalex":
-            pick, source_of_truth = (oa_val, "openalex") if oa_val is not None else (ic_val, "icite")
-        elif policy == "prefer_icite":
-            pick, source_of_truth = (ic_val, "icite") if ic_val is not None else (oa_val, "openalex")
-        elif policy == "max" and oa_val is not None and ic_val is not None:
-            pick, source_of_truth = (max(oa_val, ic_val), "reconciled")
-        elif policy == "min" and oa_val is not None and ic_val is not None:
-            pick, source_of_truth = (min(oa_val, ic_val), "reconciled")
-        elif policy == "reconcile" and oa_val is not None and ic_val is not None:
-            hi, lo = max(oa_val, ic_val), min(oa_val, ic_val)
-            if lo > 0 and (hi - lo) / lo <= 0.10:
-                pick = round((oa_val + ic_val) / 2)
-            else:
-                pick = hi
-            source_of_truth = "reconciled"
-        
-        results[pmid] = {
-            "value": pick or 0,
-            "source_of_truth": source_of_truth,
-            "sources": sources,
-            "discrepancy": discrepancy
-        }
+    # The key-view union already yields each PMID once
+    pmids = list(openalex_map.keys() | icite_map.keys())
+    if not pmids:
+        return {}
+    
+    # Counts were normalized to int (None if unparseable) by the clients when fetched
+    oa_vals = [openalex_map[pmid].get("cited_by_count", 0) if pmid in openalex_map else None for pmid in pmids]
+    ic_vals = [icite_map[pmid].get("cited_by", 0) if pmid in icite_map else None for pmid in pmids]
+    
+    # Missing counts are held as 0 next to a presence mask
+    oa_mask = np.array([v is not None for v in oa_vals], dtype=bool)
+    ic_mask = np.array([v is not None for v in ic_vals], dtype=bool)
+    oa = np.array([v if v is not None else 0 for v in oa_vals], dtype=np.int64)
+    ic = np.array([v if v is not None else 0 for v in ic_vals], dtype=np.int64)
+    both = oa_mask & ic_mask
+    
+    discrepancy = np.where(both, np.abs(oa - ic), 0)
     
-    return results
+    # Policy overrides the default selection; max/min/reconcile only apply where
+    # both sources have a value. A missing pick ends up as 0 either way
+    default_fn = DEFAULT_FNS.get(default_source)
+    if default_fn is not None:
+        pick, source_of_truth = default_fn(oa, ic, oa_mask, ic_mask)
+    else:
+        pick, source_of_truth = np.zeros(len(pmids), dtype=np.int64), np.full(len(pmids), default_source)
+    
+    policy_fn = POLICY_FNS.get(policy)
+    reconcile_fn = RECONCILE_FNS.get(policy)
+    if policy_fn is not None:
+        pick, source_of_truth = policy_fn(oa, ic, oa_mask, ic_mask)
+    elif reconcile_fn is not None:
+        pick = np.where(both, reconcile_fn(oa, ic), pick)
+        source_of_truth = np.where(both, "reconciled", source_of_truth)
+    
+    return {
+        pmid: {
+            "value": value,
+            "source_of_truth": source,
+            "sources": {
+                "openalex": {"value": oa_val, "fetched_at": now_iso},
+                "icite": {"value": ic_val, "fetched_at": now_iso}
+            },
+            "discrepancy": disc
+        }
+        for pmid, oa_val, ic_val, value, source, disc in zip(
+            pmids, oa_vals, ic_vals, pick.tolist(), source_of_truth.tolist(), discrepancy.tolist())
+    }
 
 
-def merge_records(pubmed_items: List[Dict[str, Any]], openalex_map: Dict[str, Dict[str, Any]], 
-                 icite_map: Dict[str, Dict[str, Any]], citations_source: str, citations_policy: str) -> List[Dict[str, Any]]:
-    """
-    Merge PubMed, OpenAlex, and iCite data
-    """
-    now_iso = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-    citations_map = unify_citations(openalex_map, icite_map, citations_policy, citations_source, now_iso)
+def new_citation_stats() -> Dict[str, int]:
+    """Empty counters for tally_citations"""
+    return {'both_sources': 0, 'high_discrepancy': 0}
+
+
+def tally_citations(stats: Dict[str, int], citations: Dict[str, Any]):
+    """Count one item's citations towards the both-sources and >10% discrepancy statistics"""
+    sources = citations.get('sources', {})
+    oa_val = sources.get('openalex', {}).get('value')
+    ic_val = sources.get('icite', {}).get('value')
     
-    merged_items = []
+    if oa_val is not None and ic_val is not None:
+        stats['both_sources'] += 1
+        if oa_val > 0 and ic_val > 0 and citations.get('discrepancy', 0) / max(oa_val, ic_val) > 0.10:
+            stats['high_discrepancy'] += 1
+
+
+def _merge_items(pubmed_items: List[Dict[str, Any]], openalex_map: Dict[str, Dict[str, Any]],
+                 icite_map: Dict[str, Dict[str, Any]], citations_map: Dict[str, Dict[str, Any]],
+                 stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """Enrich PubMed items in place with OpenAlex, iCite and unified citation data"""
+    openalex_get = openalex_map.get
+    icite_get = icite_map.get
+    citations_get = citations_map.get
     
     for item in pubmed_items:
         pmid = item['pmid']
-        merged_item = item.copy()
         
         # Add OpenAlex data
-        openalex_data = openalex_map.get(pmid, {})
+        openalex_data = openalex_get(pmid)
         if openalex_data:
             # Enrich DOI if missing
-            if not merged_item.get('doi') and openalex_data.get('doi'):
-                merged_item['doi'] = openalex_data['doi']
+            if not item.get('doi') and openalex_data.get('doi'):
+                item['doi'] = openalex_data['doi']
             
-            # Add OpenAlex author IDs and institutions to existing authors
-            openalex_authorships = openalex_data.get('authorships', [])
-            for i, author in enumerate(merged_item.get('authors', [])):
-                if i < len(openalex_authorships):
-                    authorship = openalex_authorships[i]
-                    author['openalex_author_id'] = authorship.get('author_id', '')
-                    author['institutions'] = authorship.get('institutions', [])
+            # Add OpenAlex author IDs and institutions to existing authors, pairing by position
+            for author, authorship in zip(item.get('authors', []), openalex_data.get('authorships', [])):
+                author['openalex_author_id'] = authorship.get('author_id', '')
+                author['institutions'] = authorship.get('institutions', [])
             
-            merged_item['openalex'] = {
+            item['openalex'] = {
                 'id': openalex_data.get('id', ''),
                 'cited_by_count': openalex_data.get('cited_by_count', 0),
                 'is_retracted': openalex_data.get('is_retracted', False),
@@ -109,33 +155,75 @@ def merge_records(pubmed_items: List[Dict[str, Any]], openalex_map: Dict[str, Di
             }
         
         # Add iCite data
-        icite_data = icite_map.get(pmid, {})
+        icite_data = icite_get(pmid)
         if icite_data:
-            merged_item['icite'] = icite_data
+            item['icite'] = icite_data
         
         # Add unified citations
-        c = citations_map.get(pmid)
-        merged_item["citations"] = c
-        
-        # Handle citation source preferences
-        if citations_source == 'openalex' and not openalex_data and icite_data:
-            # Fallback to iCite if OpenAlex not available
-            pass
-        elif citations_source == 'icite' and not icite_data and openalex_data:
-            # Fallback to OpenAlex if iCite not available
-            pass
-        
-        merged_items.append(merged_item)
+        citations = citations_get(pmid)
+        item["citations"] = citations
+        if stats is not None and citations is not None:
+            tally_citations(stats, citations)
+    
+    return pubmed_items
+
+
+def merge_records(pubmed_items: List[Dict[str, Any]], openalex_map: Dict[str, Dict[str, Any]], 
+                 icite_map: Dict[str, Dict[str, Any]], citations_source: str, citations_policy: str,
+                 stats: Optional[Dict[str, int]] = None, now_iso: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Merge PubMed, OpenAlex, and iCite data
     
-    return merged_items
+    The PubMed item dicts are enriched in place and returned in their original order.
+    If a stats dict from new_citation_stats() is given, the citation statistics are
+    tallied into it in the same pass. now_iso is the fetch time stamped on the citation
+    sources; every source dict shares that one string.
+    """
+    now_iso = now_iso or utc_now_iso()
+    citations_map = unify_citations(openalex_map, icite_map, citations_policy, citations_source, now_iso)
+    
+    return _merge_items(pubmed_items, openalex_map, icite_map, citations_map, stats)
 
 
-def save_json(payload: Dict[str, Any], file_path: str):
+def save_json(payload: Dict[str, Any], file_path: str, pretty: bool = True):
     """
-    Save data to JSON file with proper formatting
+    Save data to JSON file, indented by default
+    
+    The items list is written one record at a time, so the full serialized payload is
+    never held in memory; pretty=False drops the indentation for a smaller file.
     """
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        open_brace, sep, colon, close_brace = b'{\n  ', b',\n  ', b': ', b'\n}'
+    else:
+        open_brace, sep, colon, close_brace = b'{', b',', b':', b'}'
+    
+    def dumps(value: Any, depth: int) -> bytes:
+        # Nested values are dumped on their own, so their lines are shifted to their depth
+        data = orjson.dumps(value, option=option)
+        return data.replace(b'\n', b'\n' + b'  ' * depth) if pretty else data
+    
+    with open(file_path, 'wb') as f:
+        if not payload:
+            f.write(b'{}')
+            return
+        f.write(open_brace)
+        for i, (key, value) in enumerate(payload.items()):
+            if i:
+                f.write(sep)
+            f.write(orjson.dumps(str(key)) + colon)
+            
+            if key == 'items' and value:
+                item_sep = b',\n    ' if pretty else b','
+                f.write(b'[\n    ' if pretty else b'[')
+                for j, item in enumerate(value):
+                    if j:
+                        f.write(item_sep)
+                    f.write(dumps(item, 2))
+                f.write(b'\n  ]' if pretty else b']')
+            else:
+                f.write(dumps(value, 1))
+        f.write(close_brace)
 
 
 def print_summary(payload: Dict[str, Any]):
@@ -147,25 +235,15 @@ def print_summary(payload: Dict[str, Any]):
     year_counts = payload.get('pubmed', {}).get('year_counts', {})
     citations_source = payload.get('citations', {}).get('source_of_truth', 'N/A')
     
-    # Calculate citation statistics
-    items = payload.get('items', [])
-    both_sources_count = 0
-    high_discrepancy_count = 0
-    
-    for item in items:
-        citations = item.get('citations', {})
-        sources = citations.get('sources', {})
-        
-        oa_val = sources.get('openalex', {}).get('value')
-        ic_val = sources.get('icite', {}).get('value')
-        
-        if oa_val is not None and ic_val is not None:
-            both_sources_count += 1
-            discrepancy = citations.get('discrepancy', 0)
-            if oa_val > 0 and ic_val > 0:
-                discrepancy_pct = discrepancy / max(oa_val, ic_val)
-                if discrepancy_pct > 0.10:
-                    high_discrepancy_count += 1
+    # Citation statistics are normally tallied during the merge; older payloads
+    # without them are counted here
+    stats = payload.get('citations', {}).get('stats')
+    if stats is None:
+        stats = new_citation_stats()
+        for item in payload.get('items', []):
+            tally_citations(stats, item.get('citations', {}))
+    both_sources_count = stats['both_sources']
+    high_discrepancy_count = stats['high_discrepancy']
     
     print("\n" + "="*50)
     print("LITERATURE HARVESTER SUMMARY")
@@ -3,14 +3,15 @@ Main Literature Harvester class
 Coordinates all data sources and provides a unified interface for literature harvesting.
 """
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 
 from .config import Config
 from .pubmed import PubMedClient
 from .openalex import OpenAlexClient
 from .icite import ICiteClient
-from .data_processor import merge_records, save_json, print_summary
+from .data_processor import merge_records, new_citation_stats, save_json, print_summary
+from .utils import utc_now_iso
 
 
 class LiteratureHarvester:
@@ -21,7 +22,7 @@ class LiteratureHarvester:
     
     def __init__(self, config: Config = None):
         """Initialize the harvester with configuration"""
-        self.config = config or Config()
+        self.config = config or Config.instance()
         
         # Initialize clients
         self.pubmed = PubMedClient(self.config)
@@ -82,8 +83,13 @@ class LiteratureHarvester:
         # Step 3: Fetch article summaries
         if verbose:
             print("Fetching article summaries...")
+        try:
+            search_count = int(esearch_result.get('count'))
+        except (TypeError, ValueError):
+            search_count = None
         pubmed_items = self.pubmed.fetch_summaries_paged(
-            webenv, query_key, page_size=self.config.pubmed_batch_size, max_records=max_records
+            webenv, query_key, page_size=self.config.pubmed_batch_size, max_records=max_records,
+            total_count=search_count
         )
         
         fetched_count = len(pubmed_items)
@@ -91,39 +97,41 @@ class LiteratureHarvester:
             print(f"Fetched {fetched_count:,} article summaries")
         
         # Step 4: Supplement DOIs if needed
-        pmids_without_doi = [item['pmid'] for item in pubmed_items if not item.get('doi')]
-        if pmids_without_doi and verbose:
-            print(f"Supplementing DOIs for {len(pmids_without_doi)} articles...")
-        
-        doi_map = self.pubmed.fetch_dois_batch(pmids_without_doi)
-        
-        # Update items with DOIs
-        for item in pubmed_items:
-            if not item.get('doi') and item['pmid'] in doi_map:
-                item['doi'] = doi_map[item['pmid']]
+        items_without_doi = [item for item in pubmed_items if not item.get('doi')]
+        if items_without_doi:
+            if verbose:
+                print(f"Supplementing DOIs for {len(items_without_doi)} articles...")
+            
+            doi_map = self.pubmed.fetch_dois_batch([item['pmid'] for item in items_without_doi])
+            
+            # Update items with DOIs
+            for item in items_without_doi:
+                if item['pmid'] in doi_map:
+                    item['doi'] = doi_map[item['pmid']]
         
-        # Step 5: Fetch OpenAlex data
+        # Steps 5 and 6: Fetch OpenAlex and iCite data side by side, they are independent
         pmids = [item['pmid'] for item in pubmed_items]
         if verbose:
             print(f"Fetching OpenAlex data for {len(pmids)} articles...")
-        openalex_map = self.openalex.fetch_works_by_pmid_bulk(pmids)
-        
-        # Step 6: Fetch iCite data
-        if verbose:
             print(f"Fetching iCite citation data for {len(pmids)} articles...")
-        icite_map = self.icite.fetch_citations_bulk(pmids)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            openalex_future = executor.submit(self.openalex.fetch_works_by_pmid_bulk, pmids)
+            icite_future = executor.submit(self.icite.fetch_citations_bulk, pmids)
+            openalex_map = openalex_future.result()
+            icite_map = icite_future.result()
         
         # Step 7: Merge all data
         if verbose:
             print("Merging data from all sources...")
+        # One timestamp for the whole run, shared by the payload and every citation source
+        now_iso = utc_now_iso()
+        citation_stats = new_citation_stats()
         merged_items = merge_records(
             pubmed_items, openalex_map, icite_map, 
-            citations_source, citations_policy
+            citations_source, citations_policy, stats=citation_stats, now_iso=now_iso
         )
         
         # Step 8: Create final payload
-        now_iso = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-        
         payload = {
             "query": query,
             "year_range": {"start": start_year, "end": end_year},
@@ -135,7 +143,8 @@ class LiteratureHarvester:
             },
             "citations": {
                 "source_of_truth": citations_source,
-                "policy": citations_policy
+                "policy": citations_policy,
+                "stats": citation_stats
             },
             "items": merged_items
         }
@@ -143,7 +152,7 @@ class LiteratureHarvester:
         # Step 9: Save to file if requested
         if output_file:
             payload["output_file"] = output_file
-            save_json(payload, output_file)
+            save_json(payload, output_file, pretty=True)
             if verbose:
                 print(f"Results saved to: {output_file}")
         
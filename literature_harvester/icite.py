@@ -6,7 +6,7 @@ Handles all interactions with NIH iCite API for citation metrics.
 from typing import Dict, List, Any
 
 from .config import Config
-from .utils import APISession
+from .utils import APISession, BatchSizer, as_count, fetch_in_batches
 
 
 class ICiteClient:
@@ -15,36 +15,52 @@ class ICiteClient:
     def __init__(self, config: Config):
         self.config = config
         self.session = APISession(config.icite_base, config.icite_rate)
+        # The learned size lives on this client; the shared config stays read-only
+        self.batch_sizer = BatchSizer(
+            config.icite_batch_size,
+            config.icite_batch_size_min,
+            config.icite_batch_size_max,
+            config.batch_target_latency
+        )
     
     def fetch_citations_bulk(self, pmids: List[str]) -> Dict[str, Dict[str, Any]]:
         """
         Fetch iCite citation data for articles
+        
+        Batches are requested concurrently, sized adaptively from response times;
+        the session's rate limit still paces them.
         """
         if not pmids:
             return {}
         
         icite_data = {}
+        for batch_data in fetch_in_batches(pmids, self._fetch_batch, self.batch_sizer, self.config.icite_rate):
+            icite_data.update(batch_data)
         
-        # Process in batches
-        for i in range(0, len(pmids), self.config.icite_batch_size):
-            batch_pmids = pmids[i:i + self.config.icite_batch_size]
-            
-            params = {
-                'pmids': ','.join(batch_pmids)
-            }
+        return icite_data
+    
+    def _fetch_batch(self, batch_pmids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch citation counts for one batch of PMIDs"""
+        batch_data = {}
+        
+        params = {
+            'pmids': ','.join(batch_pmids)
+        }
+        
+        try:
+            response, elapsed = self.session.request_timed('GET', '/api/pubs', params=params)
+            self.batch_sizer.record(elapsed)
+            data = response.json()
             
-            try:
-                response = self.session.request('GET', '/api/pubs', params=params)
-                data = response.json()
-                
-                for article in data.get('data', []):
-                    pmid = str(article.get('pmid', ''))
-                    if pmid:
-                        icite_data[pmid] = {
-                            'cited_by': article.get('cited_by', 0)
-                        }
-                        
-            except Exception as e:
-                print(f"Error fetching iCite data for batch: {e}")
+            for article in data.get('data', []):
+                pmid = str(article.get('pmid', ''))
+                if pmid:
+                    batch_data[pmid] = {
+                        'cited_by': as_count(article.get('cited_by'))
+                    }
+                    
+        except Exception as e:
+            self.batch_sizer.record(None)
+            print(f"Error fetching iCite data for batch: {e}")
         
-        return icite_data
\ No newline at end of file
+        return batch_data
\ No newline at end of file
@@ -6,8 +6,15 @@ Handles all interactions with OpenAlex API for citation data and metadata.
 import re
 from typing import Dict, List, Any
 
+import orjson
+
 from .config import Config
-from .utils import APISession
+from .utils import APISession, BatchSizer, as_count, fetch_in_batches
+
+_PMID_TAIL = re.compile(r'(\d+)$')
+
+# Only the Work fields read below; nested objects such as authorships come back whole
+OPENALEX_SELECT = 'id,doi,cited_by_count,is_retracted,concepts,authorships,ids'
 
 
 class OpenAlexClient:
@@ -20,41 +27,70 @@ class OpenAlexClient:
             config.openalex_rate,
             user_agent=config.openalex_email
         )
+        # The learned size lives on this client; the shared config stays read-only
+        self.batch_sizer = BatchSizer(
+            config.openalex_batch_size,
+            config.openalex_batch_size_min,
+            config.openalex_batch_size_max,
+            config.batch_target_latency
+        )
     
     def fetch_works_by_pmid_bulk(self, pmids: List[str]) -> Dict[str, Dict[str, Any]]:
         """
         Fetch OpenAlex data for articles by PMID
+        
+        Batches are requested concurrently, sized adaptively from response times;
+        the session's rate limit still paces them.
         """
         if not pmids:
             return {}
         
         openalex_data = {}
+        for batch_data in fetch_in_batches(pmids, self._fetch_batch, self.batch_sizer, self.config.openalex_rate):
+            openalex_data.update(batch_data)
+        
+        return openalex_data
+    
+    def _fetch_batch(self, batch_pmids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch one batch of works by PMID"""
+        batch_data = {}
+        
+        # Use correct format - just the PMID numbers separated by |
+        pmid_filter = '|'.join(batch_pmids)
+        
+        params = {
+            'filter': f'ids.pmid:{pmid_filter}',
+            'per-page': self.config.openalex_page_size,
+            'cursor': '*',
+            'mailto': self.config.openalex_email,  # Required for polite pool
+            'select': OPENALEX_SELECT
+        }
         
-        # Process in batches
-        for i in range(0, len(pmids), self.config.openalex_batch_size):
-            batch_pmids = pmids[i:i + self.config.openalex_batch_size]
-            # Use correct format - just the PMID numbers separated by |
-            pmid_filter = '|'.join(batch_pmids)
-            
-            params = {
-                'filter': f'ids.pmid:{pmid_filter}',
-                'per-page': self.config.openalex_batch_size,
-                'mailto': self.config.openalex_email  # Required for polite pool
-            }
-            
-            try:
-                response = self.session.request('GET', '/works', params=params)
-                data = response.json()
+        # A filter can match more works than fit on one page, so follow the cursor until
+        # a short page or meta.count works; OpenAlex still hands out a cursor on the last page
+        try:
+            received = 0
+            while True:
+                response, elapsed = self.session.request_timed('GET', '/works', params=params)
+                self.batch_sizer.record(elapsed)
+                data = orjson.loads(response.content)
+                results = data.get('results', [])
+                received += len(results)
                 
-                for work in data.get('results', []):
-                    # Extract PMID from IDs
+                for work in results:
+                    # Extract PMID from IDs; it normally sits under 'pmid' as a PubMed URL
                     pmid = None
-                    for id_entry in work.get('ids', {}).values():
-                        if isinstance(id_entry, str) and 'pubmed' in id_entry.lower():
-                            pmid_match = re.search(r'(\d+)$', id_entry)
-                            if pmid_match:
-                                pmid = pmid_match.group(1)
-                                break
+                    ids = work.get('ids', {})
+                    tail = (ids.get('pmid') or '').rsplit('/', 1)[-1]
+                    if tail.isdigit():
+                        pmid = tail
+                    else:
+                        for id_entry in ids.values():
+                            if isinstance(id_entry, str) and 'pubmed' in id_entry.lower():
+                                pmid_match = _PMID_TAIL.search(id_entry)
+                                if pmid_match:
+                                    pmid = pmid_match.group(1)
+                                    break
                     
                     if not pmid:
                         continue
@@ -62,35 +98,42 @@ class OpenAlexClient:
                     # Extract concepts
                     concepts = [concept.get('display_name', '') for concept in work.get('concepts', [])]
                     
-                    # Extract authorships with institutions
-                    authorships = []
-                    for authorship in work.get('authorships', []):
-                        author = authorship.get('author', {})
-                        institutions = []
-                        
-                        for institution in authorship.get('institutions', []):
-                            institutions.append({
-                                'name': institution.get('display_name', ''),
-                                'ror': institution.get('ror', ''),
-                                'country_code': institution.get('country_code', '')
-                            })
-                        
-                        authorships.append({
-                            'author_id': author.get('id', ''),
-                            'display_name': author.get('display_name', ''),
-                            'institutions': institutions
-                        })
+                    # Extract authorships with institutions, keeping only the fields the
+                    # merged records carry (under the names the app reads)
+                    authorships = [
+                        {
+                            'author_id': authorship.get('author', {}).get('id', ''),
+                            'display_name': authorship.get('author', {}).get('display_name', ''),
+                            'institutions': [
+                                {
+                                    'name': institution.get('display_name', ''),
+                                    'ror': institution.get('ror', ''),
+                                    'country_code': institution.get('country_code', '')
+                                }
+                                for institution in authorship.get('institutions', [])
+                            ]
+                        }
+                        for authorship in work.get('authorships', [])
+                    ]
                     
-                    openalex_data[pmid] = {
+                    batch_data[pmid] = {
                         'id': work.get('id', ''),
                         'doi': work.get('doi', ''),
-                        'cited_by_count': work.get('cited_by_count', 0),
+                        'cited_by_count': as_count(work.get('cited_by_count')),
                         'is_retracted': work.get('is_retracted', False),
                         'concepts': concepts,
                         'authorships': authorships
                     }
-                    
-            except Exception as e:
-                print(f"Error fetching OpenAlex data for batch: {e}")
+                
+                meta = data.get('meta', {})
+                next_cursor = meta.get('next_cursor')
+                total = meta.get('count')
+                if not next_cursor or len(results) < params['per-page'] or (total is not None and received >= total):
+                    break
+                params['cursor'] = next_cursor
+                
+        except Exception as e:
+            self.batch_sizer.record(None)
+            print(f"Error fetching OpenAlex data for batch: {e}")
         
-        return openalex_data
\ No newline at end of file
+        return batch_data
\ No newline at end of file
@@ -3,13 +3,39 @@ PubMed API module for Literature Harvester
 Handles all interactions with PubMed/NCBI E-utilities API.
 """
 
+import io
 import re
+import threading
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import orjson
 from tqdm import tqdm
 
 from .config import Config
-from .utils import APISession
+from .utils import APISession, fetch_pages_concurrently
+
+# ESearch results without history kept per client; the least recently used go first
+SEARCH_CACHE_SIZE = 256
+
+_YEAR_RE = re.compile(r'\b(?:19|20)\d{2}\b')
+# ELocationID reads like "pii: S0140-6736(20)30183-5. doi: 10.1016/S0140-6736(20)30183-5"
+_ELOCATION_DOI_RE = re.compile(r'\bdoi:\s*(\S+)')
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+if etree is not None:
+    _PMID_XPATH = etree.XPath('string(.//PMID)')
+    # ELocationID precedes ArticleIdList in a PubmedArticle, so document order keeps
+    # the ELocationID DOI ahead of the ArticleId one
+    _DOI_XPATH = etree.XPath('string((.//ELocationID[@EIdType="doi"] | .//ArticleId[@IdType="doi"])[1])')
+    _SUMMARY_DOI_XPATH = etree.XPath('string(ArticleIds/ArticleId[IdType="doi"][1]/Value)')
 
 
 class PubMedClient:
@@ -20,18 +46,40 @@ class PubMedClient:
         self.session = APISession(
             config.pubmed_base, 
             config.ncbi_rate,
-            user_agent=f"LiteratureHarvester/1.0 ({config.email})"
+            user_agent=f"LiteratureHarvester/1.0 ({config.email})",
+            cache_file=config.http_cache_file,
+            cache_expire_after=config.http_cache_expire_after
         )
+        self._search_cache: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        self._search_cache_lock = threading.Lock()
     
-    def build_search_term(self, query: str, start_year: int, end_year: int) -> str:
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def build_search_term(query: str, start_year: int, end_year: int) -> str:
         """Build PubMed search term with date range"""
         return f'({query}[Title/Abstract]) AND ("{start_year}"[dp] : "{end_year}"[dp])'
     
     def search(self, term: str, retmax: int = 0, retstart: int = 0, 
-               usehistory: bool = True) -> Dict[str, Any]:
+               usehistory: bool = True, rettype: Optional[str] = None,
+               use_cache: bool = True) -> Dict[str, Any]:
         """
         Execute PubMed ESearch query
+        
+        rettype='count' returns only the hit count, without an ID list or history.
+        Searches without history are remembered for the client's lifetime (as the raw
+        response, so each caller gets its own dict); history searches are always sent,
+        since their WebEnv expires on the NCBI side.
         """
+        key = (term, retmax, retstart, rettype)
+        cacheable = use_cache and not usehistory
+        if cacheable:
+            with self._search_cache_lock:
+                cached = self._search_cache.get(key)
+                if cached is not None:
+                    self._search_cache.move_to_end(key)
+            if cached is not None:
+                return orjson.loads(cached)
+        
         params = {
             'db': 'pubmed',
             'term': term,
@@ -45,111 +93,108 @@ class PubMedClient:
         if usehistory:
             params['usehistory'] = 'y'
         
+        if rettype:
+            params['rettype'] = rettype
+        
         if self.config.ncbi_api_key:
             params['api_key'] = self.config.ncbi_api_key
         
         response = self.session.request('GET', '/esearch.fcgi', params=params)
-        return response.json()
+        result = orjson.loads(response.content)
+        
+        # Searches NCBI rejected are not remembered
+        if cacheable and 'ERROR' not in result.get('esearchresult', {}):
+            with self._search_cache_lock:
+                self._search_cache[key] = response.content
+                if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
+        
+        return result
     
-    def get_year_counts(self, query: str, start_year: int, end_year: int) -> Dict[str, int]:
+    def get_year_counts(self, query: str, start_year: int, end_year: int,
+                        use_cache: bool = True) -> Dict[str, int]:
         """
         Get publication counts per year
-        """
-        year_counts = {}
         
-        for year in range(start_year, end_year + 1):
+        Years are queried concurrently. Each year's count is remembered by search(), so
+        repeated harvests of the same range skip the years that already succeeded.
+        """
+        def year_count(year: int) -> Optional[int]:
             term = f'({query}[Title/Abstract]) AND ("{year}"[dp] : "{year}"[dp])'
             try:
-                result = self.search(term, retmax=0, usehistory=False)
-                count = int(result.get('esearchresult', {}).get('count', 0))
-                year_counts[str(year)] = count
+                result = self.search(term, usehistory=False, rettype='count', use_cache=use_cache)
+                return int(result.get('esearchresult', {}).get('count', 0))
             except Exception as e:
                 print(f"Warning: Failed to get count for year {year}: {e}")
-                year_counts[str(year)] = 0
+                return None
+        
+        # One ESearch per year, issued concurrently; the session's rate limit still
+        # spaces them out, and map keeps the years in order
+        years = range(start_year, end_year + 1)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(years), int(self.config.ncbi_rate)))) as executor:
+            counts = list(executor.map(year_count, years))
         
-        return year_counts
+        return {str(year): count if count is not None else 0 for year, count in zip(years, counts)}
     
     def fetch_summaries_paged(self, webenv: str, query_key: str, page_size: int, 
-                             max_records: Optional[int] = None) -> List[Dict[str, Any]]:
+                             max_records: Optional[int] = None,
+                             total_count: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Fetch article summaries using ESummary with paging
+        
+        With the search's total_count the page offsets are known up front and the pages are
+        fetched concurrently; otherwise pages are fetched one after another until a short page.
         """
         articles = []
-        retstart = 0
+        
+        # Everything but the page window is the same for every page
+        base_params = {
+            'db': 'pubmed',
+            'query_key': query_key,
+            'WebEnv': webenv,
+            'retmode': 'json',
+            'email': self.config.email
+        }
+        
+        if self.config.ncbi_api_key:
+            base_params['api_key'] = self.config.ncbi_api_key
+        
+        if etree is not None:
+            # Version 2.0 XML can be streamed record by record, reading only the fields kept
+            base_params['retmode'] = 'xml'
+            base_params['version'] = '2.0'
         
         with tqdm(desc="Fetching PubMed articles", unit="articles") as pbar:
+            if total_count is not None:
+                limit = min(total_count, max_records) if max_records else total_count
+                windows = [(retstart, min(page_size, limit - retstart)) for retstart in range(0, limit, page_size)]
+                
+                def fetch_window(window):
+                    return self._fetch_summary_page(base_params, *window)
+                
+                try:
+                    for _, page in fetch_pages_concurrently(fetch_window, windows, self.config.ncbi_rate):
+                        articles.extend(page)
+                        pbar.update(len(page))
+                except Exception as e:
+                    print(f"Error fetching articles at offset {len(articles)}: {e}")
+                return articles
+            
+            retstart = 0
             while True:
                 if max_records and len(articles) >= max_records:
                     break
                 
                 current_page_size = min(page_size, max_records - len(articles)) if max_records else page_size
                 
-                params = {
-                    'db': 'pubmed',
-                    'query_key': query_key,
-                    'WebEnv': webenv,
-                    'retmode': 'json',
-                    'retstart': retstart,
-                    'retmax': current_page_size,
-                    'email': self.config.email
-                }
-                
-                if self.config.ncbi_api_key:
-                    params['api_key'] = self.config.ncbi_api_key
-                
                 try:
-                    response = self.session.request('GET', '/esummary.fcgi', params=params)
-                    data = response.json()
-                    
-                    result = data.get('result', {})
-                    if not result or 'uids' not in result:
-                        break
+                    uids, page = self._fetch_summary_page(base_params, retstart, current_page_size)
+                    articles.extend(page)
+                    pbar.update(len(page))
                     
-                    uids = result['uids']
                     if not uids:
                         break
                     
-                    for uid in uids:
-                        if uid in result:
-                            article_data = result[uid]
-                            
-                            # Extract authors
-                            authors = []
-                            author_list = article_data.get('authors', [])
-                            for i, author in enumerate(author_list):
-                                authors.append({
-                                    'name': author.get('name', ''),
-                                    'order': i + 1
-                                })
-                            
-                            # Extract publication year
-                            pub_year = None
-                            pub_date = article_data.get('pubdate', '')
-                            if pub_date:
-                                year_match = re.search(r'\b(19|20)\d{2}\b', pub_date)
-                                if year_match:
-                                    pub_year = int(year_match.group())
-                            
-                            # Extract DOI from article IDs
-                            doi = None
-                            article_ids = article_data.get('articleids', [])
-                            for aid in article_ids:
-                                if aid.get('idtype') == 'doi':
-                                    doi = aid.get('value')
-                                    break
-                            
-                            article = {
-                                'pmid': uid,
-                                'title': article_data.get('title', ''),
-                                'journal': article_data.get('fulljournalname', ''),
-                                'pub_year': pub_year,
-                                'doi': doi,
-                                'authors': authors
-                            }
-                            
-                            articles.append(article)
-                            pbar.update(1)
-                    
                     retstart += len(uids)
                     
                     if len(uids) < current_page_size:
@@ -161,6 +206,28 @@ class PubMedClient:
         
         return articles
     
+    def _fetch_summary_page(self, base_params: Dict[str, Any], retstart: int,
+                            retmax: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Fetch one ESummary page; returns the page's UIDs and the articles parsed from it"""
+        params = {**base_params, 'retstart': retstart, 'retmax': retmax}
+        
+        if etree is not None:
+            # The body is read inside the session's retries, then parsed record by record
+            response = self.session.request('GET', '/esummary.fcgi', params=params)
+            return _parse_summaries_xml(io.BytesIO(response.content))
+        
+        response = self.session.request('GET', '/esummary.fcgi', params=params)
+        data = orjson.loads(response.content)
+        
+        result = data.get('result', {})
+        if not result or 'uids' not in result:
+            return [], []
+        
+        uids = result['uids']
+        articles = [_build_article(uid, result[uid]) for uid in uids if uid in result]
+        
+        return uids, articles
+    
     def fetch_dois_batch(self, pmids: List[str]) -> Dict[str, str]:
         """
         Fetch DOIs for articles using EFetch XML (for articles missing DOI in ESummary)
@@ -168,51 +235,160 @@ class PubMedClient:
         if not pmids:
             return {}
         
+        batch_size = self.config.pubmed_batch_size
+        batches = [pmids[i:i + batch_size] for i in range(0, len(pmids), batch_size)]
+        
+        base_params = {
+            'db': 'pubmed',
+            'retmode': 'xml',
+            'email': self.config.email
+        }
+        
+        if self.config.ncbi_api_key:
+            base_params['api_key'] = self.config.ncbi_api_key
+        
         dois = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(len(batches), int(self.config.ncbi_rate)))) as executor:
+            for batch_dois in executor.map(lambda batch: self._fetch_doi_batch(base_params, batch), batches):
+                dois.update(batch_dois)
+        
+        return dois
+    
+    def _fetch_doi_batch(self, base_params: Dict[str, Any], batch_pmids: List[str]) -> Dict[str, str]:
+        """Fetch DOIs for one batch of PMIDs"""
+        batch_dois = {}
+        
+        params = {**base_params, 'id': ','.join(batch_pmids)}
+        
+        try:
+            response = self.session.request('GET', '/efetch.fcgi', params=params)
+            if etree is None:
+                batch_dois.update(_parse_dois_etree(io.BytesIO(response.content)))
+            else:
+                # Parse one record at a time and drop each once read, so a large batch
+                # never holds the whole document tree
+                for _, article in etree.iterparse(io.BytesIO(response.content), tag='PubmedArticle'):
+                    pmid = _PMID_XPATH(article)
+                    doi = _DOI_XPATH(article)
+                    if pmid and doi:
+                        batch_dois[pmid] = doi
+                    
+                    article.clear()
+                    while article.getprevious() is not None:
+                        del article.getparent()[0]
+                    
+        except Exception as e:
+            print(f"Error fetching DOIs for batch: {e}")
+        
+        return batch_dois
+
+
+def _pub_year(pub_date: str) -> Optional[int]:
+    """Publication year from a summary's PubDate"""
+    # PubDate almost always starts with the year ("2019 Mar 5", "2019"); anything
+    # else ("Winter 2019", "2019Jan") goes through the regex
+    head = pub_date[:4]
+    if len(head) == 4 and head[:2] in ('19', '20') and head[2:].isdecimal() and pub_date[4:5] in ('', ' '):
+        return int(head)
+    year_match = _YEAR_RE.search(pub_date)
+    return int(year_match.group()) if year_match else None
+
+
+def _elocation_doi(elocation: Optional[str]) -> Optional[str]:
+    """DOI from a summary's ELocationID, which sometimes has one that ArticleIds lacks"""
+    doi_match = _ELOCATION_DOI_RE.search(elocation or '')
+    return doi_match.group(1) if doi_match else None
+
+
+def _build_article(uid: str, article_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Article record from one ESummary document"""
+    # Extract authors
+    authors = [
+        {'name': author.get('name', ''), 'order': i + 1}
+        for i, author in enumerate(article_data.get('authors') or ())
+    ]
+    
+    # Extract publication year
+    pub_year = _pub_year(article_data.get('pubdate') or '')
+    
+    # Extract DOI from article IDs
+    doi = None
+    article_ids = article_data.get('articleids', [])
+    for aid in article_ids:
+        if aid.get('idtype') == 'doi':
+            doi = aid.get('value')
+            break
+    
+    if not doi:
+        doi = _elocation_doi(article_data.get('elocationid'))
+    
+    return {
+        'pmid': uid,
+        'title': article_data.get('title', ''),
+        'journal': article_data.get('fulljournalname', ''),
+        'pub_year': pub_year,
+        'doi': doi,
+        'authors': authors
+    }
+
+
+def _parse_summaries_xml(source: BinaryIO) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """UIDs and article records from an ESummary version 2.0 XML page"""
+    uids = []
+    articles = []
+    for _, docsum in etree.iterparse(source, tag='DocumentSummary'):
+        uid = docsum.get('uid')
+        uids.append(uid)
+        
+        pub_year = _pub_year(docsum.findtext('PubDate') or '')
+        
+        authors = [
+            {'name': author.findtext('Name') or '', 'order': i + 1}
+            for i, author in enumerate(docsum.iterfind('Authors/Author'))
+        ]
         
-        # Process in batches
-        for i in range(0, len(pmids), self.config.pubmed_batch_size):
-            batch_pmids = pmids[i:i + self.config.pubmed_batch_size]
+        articles.append({
+            'pmid': uid,
+            'title': docsum.findtext('Title') or '',
+            'journal': docsum.findtext('FullJournalName') or '',
+            'pub_year': pub_year,
+            'doi': _SUMMARY_DOI_XPATH(docsum) or _elocation_doi(docsum.findtext('ELocationID')),
+            'authors': authors
+        })
+        
+        docsum.clear()
+        while docsum.getprevious() is not None:
+            del docsum.getparent()[0]
+    
+    return uids, articles
+
+def _parse_dois_etree(source: BinaryIO) -> Dict[str, str]:
+    """PMID -> DOI from EFetch XML with the standard library parser (used when lxml is missing)"""
+    dois = {}
+    for _, article in ET.iterparse(source):
+        if article.tag != 'PubmedArticle':
+            continue
+        
+        pmid_elem = article.find('.//PMID')
+        if pmid_elem is not None:
+            doi = None
             
-            params = {
-                'db': 'pubmed',
-                'id': ','.join(batch_pmids),
-                'retmode': 'xml',
-                'email': self.config.email
-            }
+            # Look for DOI in ELocationID
+            for elocation in article.findall('.//ELocationID'):
+                if elocation.get('EIdType') == 'doi':
+                    doi = elocation.text
+                    break
             
-            if self.config.ncbi_api_key:
-                params['api_key'] = self.config.ncbi_api_key
+            # Look for DOI in ArticleIdList
+            if not doi:
+                for article_id in article.findall('.//ArticleId'):
+                    if article_id.get('IdType') == 'doi':
+                        doi = article_id.text
+                        break
             
-            try:
-                response = self.session.request('GET', '/efetch.fcgi', params=params)
-                root = ET.fromstring(response.content)
-                
-                for article in root.findall('.//PubmedArticle'):
-                    pmid_elem = article.find('.//PMID')
-                    if pmid_elem is None:
-                        continue
-                    
-                    pmid = pmid_elem.text
-                    doi = None
-                    
-                    # Look for DOI in ELocationID
-                    for elocation in article.findall('.//ELocationID'):
-                        if elocation.get('EIdType') == 'doi':
-                            doi = elocation.text
-                            break
-                    
-                    # Look for DOI in ArticleIdList
-                    if not doi:
-                        for article_id in article.findall('.//ArticleId'):
-                            if article_id.get('IdType') == 'doi':
-                                doi = article_id.text
-                                break
-                    
-                    if doi:
-                        dois[pmid] = doi
-                        
-            except Exception as e:
-                print(f"Error fetching DOIs for batch: {e}")
+            if doi:
+                dois[pmid_elem.text] = doi
         
-        return dois
\ No newline at end of file
+        article.clear()
+    
+    return dois
@@ -3,48 +3,175 @@ Utility functions for Literature Harvester
 Contains common functionality like API session management, retry logic, and data processing.
 """
 
-import json
 import random
+import threading
 import time
-from typing import Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 class APISession:
     """Manages API sessions with rate limiting and retry logic"""
     
-    def __init__(self, base_url: str, rate_limit: float, user_agent: str = None):
-        self.session = requests.Session()
+    def __init__(self, base_url: str, rate_limit: float, user_agent: str = None,
+                 cache_file: Optional[str] = None, cache_expire_after: Optional[Dict[str, int]] = None):
+        if cache_file:
+            # Credentials are left out of the cache key so cached responses survive a key change
+            self.session = requests_cache.CachedSession(
+                cache_name=cache_file, backend='sqlite', expire_after=86400,
+                urls_expire_after=cache_expire_after, allowable_methods=('GET',),
+                ignored_parameters=['api_key', 'email'], stale_if_error=True
+            )
+        else:
+            self.session = requests.Session()
+        # Keep a warm keep-alive connection for every concurrent batch worker, so
+        # parallel batches never reopen TCP/TLS connections to the host. Dropped or
+        # refused connections are retried by urllib3 on the pool; HTTP status retries
+        # (429/5xx, Retry-After) stay with retry_request so they are not doubled up
+        pool_size = max(32, int(rate_limit))
+        transport_retry = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False,
+                              max_retries=transport_retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.base_url = base_url
         self.rate_limit = rate_limit
-        self.last_request_time = 0
+        # Start times of the most recent requests (some possibly reserved in the near
+        # future); at most `burst` of them may fall within any `burst / rate_limit` seconds
+        self.burst = max(1, int(rate_limit)) if rate_limit > 0 else 1
+        self._request_times = deque()
+        self._rate_lock = threading.Lock()
         
         if user_agent:
             self.session.headers.update({'User-Agent': user_agent})
     
     def _wait_for_rate_limit(self):
-        """Enforce rate limiting"""
-        if self.rate_limit > 0:
-            time_since_last = time.time() - self.last_request_time
-            min_interval = 1.0 / self.rate_limit
-            if time_since_last < min_interval:
-                time.sleep(min_interval - time_since_last)
-        self.last_request_time = time.time()
+        """
+        Enforce rate limiting as a sliding window (safe to call from several threads)
+        
+        Up to `burst` requests go out back to back; after that each one waits until the
+        oldest request in the window ages out, so the long-run rate still holds.
+        """
+        if self.rate_limit <= 0:
+            return
+        
+        period = self.burst / self.rate_limit
+        # Reserve the next start time under the lock, then sleep outside it so
+        # concurrent callers queue up behind one another
+        with self._rate_lock:
+            now = time.time()
+            while self._request_times and now - self._request_times[0] >= period:
+                self._request_times.popleft()
+            
+            if len(self._request_times) < self.burst:
+                start = now
+            else:
+                start = self._request_times.popleft() + period
+            self._request_times.append(start)
+        
+        if start > now:
+            time.sleep(start - now)
     
     def request(self, method: str, url: str, **kwargs) -> requests.Response:
         """Make rate-limited request with retry logic"""
+        return self.request_timed(method, url, **kwargs)[0]
+    
+    def request_timed(self, method: str, url: str, **kwargs) -> Tuple[requests.Response, float]:
+        """
+        Make rate-limited request with retry logic, also returning the HTTP round trip in
+        seconds; time spent waiting on the rate limit or backing off is not included
+        """
         self._wait_for_rate_limit()
         full_url = f"{self.base_url}/{url.lstrip('/')}" if not url.startswith('http') else url
-        return retry_request(self.session, method, full_url, **kwargs)
+        return retry_request_timed(self.session, method, full_url, **kwargs)
+
+
+class BatchSizer:
+    """Additive-increase/multiplicative-decrease controller for request batch sizes"""
+    
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float,
+                 step: Optional[int] = None, backoff: float = 0.9):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.current = max(minimum, min(maximum, initial))
+        self.target_latency = target_latency
+        self.step = step or max(1, maximum // 20)
+        self.backoff = backoff
+        self._lock = threading.Lock()
+    
+    def record(self, elapsed: Optional[float]):
+        """Grow after a response faster than the target, back off after a slow or failed one (None)"""
+        with self._lock:
+            if elapsed is not None and elapsed < self.target_latency:
+                self.current = min(self.maximum, self.current + self.step)
+            else:
+                self.current = max(self.minimum, int(self.current * self.backoff))
+
+
+def fetch_in_batches(items: List[str], fetch_batch: Callable[[List[str]], Dict[str, Any]],
+                     sizer: BatchSizer, max_workers: int) -> Iterator[Dict[str, Any]]:
+    """
+    Yield fetch_batch results over consecutive slices of items, in order
+    
+    Batches go out in waves of max_workers concurrent requests; each wave is cut at the
+    size the sizer has settled on after the previous one.
+    """
+    max_workers = max(1, int(max_workers))
+    start = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while start < len(items):
+            batches = []
+            size = sizer.current
+            while start < len(items) and len(batches) < max_workers:
+                batches.append(items[start:start + size])
+                start += size
+            yield from executor.map(fetch_batch, batches)
+
+
+def fetch_pages_concurrently(fetch_page: Callable[[Any], Any], windows: List[Any],
+                             max_workers: int) -> Iterator[Any]:
+    """
+    Yield fetch_page(window) for each window in order, with at most max_workers pages in flight
+    
+    Pages of the same search history are independent, so they can be requested side by
+    side; the session's rate limit still paces them.
+    """
+    max_workers = max(1, int(max_workers))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for window in windows:
+            pending.append(executor.submit(fetch_page, window))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        
+        while pending:
+            yield pending.popleft().result()
 
 
 def retry_request(session: requests.Session, method: str, url: str, max_retries: int = 5, **kwargs) -> requests.Response:
     """
     Retry HTTP requests with exponential backoff and jitter
     """
+    return retry_request_timed(session, method, url, max_retries, **kwargs)[0]
+
+
+def retry_request_timed(session: requests.Session, method: str, url: str, max_retries: int = 5,
+                        **kwargs) -> Tuple[requests.Response, float]:
+    """
+    retry_request, also returning the round trip in seconds of the attempt that produced
+    the response (backoff sleeps and earlier attempts are not counted)
+    """
     for attempt in range(max_retries + 1):
         try:
+            start = time.perf_counter()
             response = session.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - start
             
             # Handle rate limiting
             if response.status_code == 429:
@@ -58,6 +185,8 @@ def retry_request(session: requests.Session, method: str, url: str, max_retries:
                 else:
                     wait_time = min(60, (2 ** attempt) + random.uniform(0, 1))
                 
+                # Hand the connection back to the pool before waiting
+                response.close()
                 print(f"Rate limited, waiting {wait_time:.1f}s...")
                 time.sleep(wait_time)
                 continue
@@ -68,13 +197,14 @@ def retry_request(session: requests.Session, method: str, url: str, max_retries:
                     response.raise_for_status()
                 
                 wait_time = min(60, (2 ** attempt) + random.uniform(0, 1))
+                response.close()
                 print(f"Server error {response.status_code}, retrying in {wait_time:.1f}s...")
                 time.sleep(wait_time)
                 continue
             
             # Success or client error
             response.raise_for_status()
-            return response
+            return response, elapsed
             
         except requests.exceptions.RequestException as e:
             if attempt == max_retries:
@@ -88,49 +218,18 @@ def retry_request(session: requests.Session, method: str, url: str, max_retries:
     raise Exception("Max retries exceeded")
 
 
-def save_json(payload: Dict[str, Any], file_path: str):
-    """Save payload to JSON file with pretty formatting"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
+def as_count(value: Any) -> Optional[int]:
+    """Citation count as an int: missing or empty counts as 0, an unparseable value as None"""
+    if type(value) is int:
+        return value
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
-def print_summary(payload: Dict[str, Any]):
-    """Print summary of harvested data"""
-    print("\n" + "="*60)
-    print("LITERATURE HARVEST SUMMARY")
-    print("="*60)
-    
-    # Basic info
-    print(f"Query: {payload.get('query', 'N/A')}")
-    year_range = payload.get('year_range', {})
-    print(f"Year range: {year_range.get('start', 'N/A')}-{year_range.get('end', 'N/A')}")
-    
-    # PubMed stats
-    pubmed_stats = payload.get('pubmed', {})
-    print(f"Total PubMed articles: {pubmed_stats.get('total_count', 0):,}")
-    print(f"Articles fetched: {pubmed_stats.get('fetched_count', 0):,}")
-    
-    # Year breakdown
-    year_counts = pubmed_stats.get('year_counts', {})
-    if year_counts:
-        print("\nYear-by-year breakdown:")
-        for year in sorted(year_counts.keys()):
-            print(f"  {year}: {year_counts[year]:,} articles")
-    
-    # Citation stats
-    items = payload.get('items', [])
-    if items:
-        citations_available = sum(1 for item in items if item.get('citations_value') is not None)
-        print(f"\nCitation data available: {citations_available:,}/{len(items):,} articles")
-        
-        if citations_available > 0:
-            citations = [item['citations_value'] for item in items if item.get('citations_value') is not None]
-            print(f"Citation range: {min(citations)}-{max(citations)}")
-            print(f"Average citations: {sum(citations)/len(citations):.1f}")
-    
-    # DOI stats
-    dois_available = sum(1 for item in items if item.get('doi'))
-    print(f"DOIs available: {dois_available:,}/{len(items):,} articles")
-    
-    print(f"\nResults saved to: {payload.get('output_file', 'N/A')}")
-    print("="*60)
\ No newline at end of file
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO 8601 string to the second, with a Z suffix"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')